@@ -0,0 +1,36 @@
+"""SQLite с настраиваемыми PRAGMA и соединением только для чтения.
+
+В OPTIONS базы, кроме параметров sqlite3.connect, понимаются:
+pragmas - словарь PRAGMA, которые выполняются при каждом новом
+соединении; read_only - открыть файл с mode=ro, так что запись
+невозможна на уровне SQLite.
+"""
+from urllib.parse import quote
+
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        options = self.settings_dict['OPTIONS']
+        self.pragmas = options.get('pragmas', {})
+        self.read_only = options.get('read_only', False)
+        params = super().get_connection_params()
+        params.pop('pragmas', None)
+        params.pop('read_only', None)
+        if self.read_only:
+            params['database'] = self.read_only_uri(params['database'])
+        return params
+
+    @staticmethod
+    def read_only_uri(name):
+        if name.startswith('file:'):
+            separator = '&' if '?' in name else '?'
+            return f'{name}{separator}mode=ro'
+        return f'file:{quote(name)}?mode=ro'
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        for pragma, value in self.pragmas.items():
+            connection.execute(f'PRAGMA {pragma} = {value}')
+        return connection
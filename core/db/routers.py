@@ -0,0 +1,55 @@
+"""Чтение с отдельного соединения только для чтения, запись - в основную.
+
+Реплика - тот же файл SQLite, открытый с mode=ro (settings.READ_REPLICA),
+поэтому читатели ленты не держат соединение писателя. Чтение идет в
+основную базу, если:
+- реплика не настроена (в тестах ее выключает core.testing.TestRunner);
+- открыта транзакция основной базы (чтение внутри нее должно видеть
+  свои же изменения);
+- запрос обрабатывается в режиме use_primary (изменяющий запрос или
+  запрос пользователя, который недавно что-то записал).
+"""
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_state = threading.local()
+
+
+@contextmanager
+def use_primary(enabled=True):
+    """Направляет чтение в основную базу внутри блока."""
+    previous = getattr(_state, 'primary', False)
+    _state.primary = previous or enabled
+    try:
+        yield
+    finally:
+        _state.primary = previous
+
+
+def replica_alias():
+    alias = getattr(settings, 'READ_REPLICA', None)
+    if alias not in connections.databases:
+        return None
+    return alias
+
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = replica_alias()
+        if (alias is None or getattr(_state, 'primary', False)
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Обе базы - один и тот же файл.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,66 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.sqlite_cache import SQLiteCache
+
+BACKENDS = {
+    'sqlite': lambda directory, options: SQLiteCache(
+        os.path.join(directory, 'cache.sqlite3'), {'OPTIONS': options}),
+    'locmem': lambda directory, options: LocMemCache(
+        directory, {'OPTIONS': options}),
+    'filebased': lambda directory, options: FileBasedCache(
+        directory, {'OPTIONS': options}),
+}
+
+
+def operations(cache, keys):
+    """Операции замера: имя и функция, выполняющая одну итерацию."""
+    value = {'html': 'x' * 2048}
+    data = {key: value for key in keys[:20]}
+    cache.set('counter', 0)
+    return [
+        ('set', lambda key: cache.set(key, value)),
+        ('get', lambda key: cache.get(key)),
+        ('get_many(20)', lambda key: cache.get_many(list(data))),
+        ('set_many(20)', lambda key: cache.set_many(data)),
+        ('incr', lambda key: cache.incr('counter')),
+    ]
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает скорость SQLiteCache, LocMemCache и FileBasedCache '
+            '(операций в секунду).')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keys', type=int, default=2000,
+            help='Сколько разных ключей использовать.')
+        parser.add_argument(
+            '--backend', action='append', choices=sorted(BACKENDS),
+            help='Какие бэкенды замерять (по умолчанию все).')
+
+    def handle(self, *args, **options):
+        keys = [f'bench:{i}' for i in range(options['keys'])]
+        cache_options = {'MAX_ENTRIES': len(keys) * 2}
+        self.stdout.write('{:<12}{:>14}{:>14}'.format(
+            'backend', 'operation', 'ops/sec'))
+        for name in options['backend'] or list(BACKENDS):
+            directory = tempfile.mkdtemp()
+            try:
+                cache = BACKENDS[name](directory, cache_options)
+                for operation, run in operations(cache, keys):
+                    started = time.perf_counter()
+                    for key in keys:
+                        run(key)
+                    rate = len(keys) / (time.perf_counter() - started)
+                    self.stdout.write(
+                        f'{name:<12}{operation:>14}{rate:>14.0f}')
+                cache.clear()
+            finally:
+                shutil.rmtree(directory)
@@ -0,0 +1,59 @@
+import logging
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .db import routers
+from .queries import QueryRecorder
+
+logger = logging.getLogger('core.queries')
+
+
+class QueryInspectorMiddleware:
+    """Считает SQL-запросы каждого запроса и предупреждает о N+1.
+
+    Работает только при DEBUG: число запросов уходит в заголовок
+    X-Query-Count, повторяющиеся формы - в лог core.queries.
+    """
+
+    def __init__(self, get_response):
+        if not settings.DEBUG:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        response['X-Query-Count'] = len(recorder)
+        repeated = recorder.repeated()
+        if repeated:
+            logger.warning(
+                'Возможный N+1 на %s (%d запросов):\n%s',
+                request.path, len(recorder), recorder.report(repeated))
+        return response
+
+
+class ReadReplicaMiddleware:
+    """Читает из основной базы изменяющие запросы и недавних писателей.
+
+    После POST и других изменяющих запросов ставится кука на
+    READ_REPLICA_STICKY_SECONDS: пока она есть, чтение пользователя тоже
+    идет в основную базу, и он сразу видит свой пост или комментарий.
+    """
+
+    cookie = 'primary'
+    safe_methods = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        writes = request.method not in self.safe_methods
+        with routers.use_primary(writes or self.cookie in request.COOKIES):
+            response = self.get_response(request)
+        if writes:
+            response.set_cookie(
+                self.cookie, '1',
+                max_age=settings.READ_REPLICA_STICKY_SECONDS,
+                httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,145 @@
+"""Запись SQL-запросов и поиск N+1 по повторяющимся формам запросов.
+
+Django передает в курсор параметризованный SQL, поэтому текст запроса
+без параметров и есть его "форма": один и тот же SQL, выполненный
+много раз за запрос, почти всегда означает ленивую загрузку в цикле.
+"""
+import os
+import re
+import sys
+import time
+from collections import OrderedDict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.template.base import Node
+
+RENDER_CODE = Node.render_annotated.__code__
+# Строки EXPLAIN QUERY PLAN SQLite, означающие чтение всей таблицы
+# (не по индексу) или сортировку во временном B-дереве. Служебные
+# таблицы SQLite и уже вычисленные подзапросы не в счет.
+FULL_SCAN = re.compile(
+    r'^SCAN (?:TABLE )?(?!sqlite_|subquery)\w+(?: AS \w+)?$')
+TEMP_SORT = re.compile(r'USE TEMP B-TREE')
+
+
+def query_origin():
+    """Откуда пришел запрос: строка шаблона или строка кода проекта."""
+    code_site = None
+    frame = sys._getframe(1)
+    while frame is not None:
+        if frame.f_code is RENDER_CODE:
+            node = frame.f_locals.get('self')
+            token = getattr(node, 'token', None)
+            origin = getattr(node, 'origin', None)
+            if token is not None and origin is not None:
+                name = origin.template_name or origin.name
+                return f'{name}:{token.lineno}'
+        elif code_site is None:
+            filename = frame.f_code.co_filename
+            if (filename.startswith(settings.BASE_DIR)
+                    and filename != __file__
+                    and 'site-packages' not in filename):
+                code_site = '{}:{}'.format(
+                    os.path.relpath(filename, settings.BASE_DIR),
+                    frame.f_lineno)
+        frame = frame.f_back
+    return code_site
+
+
+class QueryShape:
+    def __init__(self, sql):
+        self.sql = sql
+        self.count = 0
+        self.duration = 0
+        self.origins = OrderedDict()
+
+    def __repr__(self):
+        return f'<QueryShape x{self.count}: {self.sql[:60]}>'
+
+
+class QueryRecorder:
+    """Контекстный менеджер, записывающий все запросы ко всем базам."""
+
+    def __init__(self):
+        self.queries = []
+        self._stack = None
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'params': params,
+                'alias': context['connection'].alias,
+                'duration': time.perf_counter() - started,
+                'origin': query_origin(),
+            })
+
+    def __len__(self):
+        return len(self.queries)
+
+    def shapes(self):
+        """Формы запросов в порядке первого появления."""
+        shapes = OrderedDict()
+        for query in self.queries:
+            shape = shapes.setdefault(query['sql'], QueryShape(query['sql']))
+            shape.count += 1
+            shape.duration += query['duration']
+            origin = query['origin']
+            shape.origins[origin] = shape.origins.get(origin, 0) + 1
+        return list(shapes.values())
+
+    def repeated(self, threshold=None):
+        """Формы, повторившиеся не менее threshold раз (кандидаты N+1)."""
+        if threshold is None:
+            threshold = getattr(settings, 'QUERY_REPEAT_THRESHOLD', 3)
+        return [shape for shape in self.shapes() if shape.count >= threshold]
+
+    def report(self, shapes=None):
+        lines = []
+        for shape in self.shapes() if shapes is None else shapes:
+            origins = ', '.join(
+                f'{origin} x{count}'
+                for origin, count in shape.origins.items())
+            lines.append(f'x{shape.count} [{origins}] {shape.sql}')
+        return '\n'.join(lines)
+
+
+def query_plan(query):
+    """Строки EXPLAIN QUERY PLAN записанного запроса (SQLite)."""
+    with connections[query['alias']].cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {query["sql"]}', query['params'])
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def plan_problems(recorder, ignore=(), temp_sort=False):
+    """[(запрос, план)] чтений с полным сканом или временной сортировкой.
+
+    ignore - подстроки SQL запросов, которые не проверяются; temp_sort
+    разрешает сортировать строки, уже найденные по индексам.
+    """
+    problems = []
+    for query in recorder.queries:
+        sql = query['sql']
+        if (not sql.lstrip().upper().startswith('SELECT')
+                or any(part in sql for part in ignore)):
+            continue
+        plan = query_plan(query)
+        if any(FULL_SCAN.match(line)
+               or not temp_sort and TEMP_SORT.search(line)
+               for line in plan):
+            problems.append((query, plan))
+    return problems
@@ -0,0 +1,246 @@
+"""Кэш в файле SQLite, общий для всех процессов на одной машине.
+
+Файл открыт в режиме WAL: читатели не блокируют писателя, а воркеры
+gunicorn видят записи и инвалидации друг друга без memcached/redis.
+Целые числа хранятся как INTEGER, поэтому incr - один атомарный UPDATE;
+остальные значения хранятся как pickle. Когда записей больше
+MAX_ENTRIES, вытесняются давно не читанные (приближенный LRU: время
+чтения обновляется не чаще раза в ACCESS_RESOLUTION секунд, а размер
+проверяется раз в CULL_EVERY записей).
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires);
+'''
+NOT_EXPIRED = '(expires IS NULL OR expires > ?)'
+# Ограничение SQLite на число параметров в одном запросе.
+CHUNK_SIZE = 500
+INT_RANGE = range(-2 ** 63, 2 ** 63)
+
+
+def chunks(items):
+    for start in range(0, len(items), CHUNK_SIZE):
+        yield items[start:start + CHUNK_SIZE]
+
+
+def placeholders(items):
+    return ', '.join('?' * len(items))
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        self._mmap_size = int(options.get('MMAP_SIZE', 64 * 1024 * 1024))
+        self._access_resolution = float(
+            options.get('ACCESS_RESOLUTION', 10))
+        self._cull_every = int(options.get('CULL_EVERY', 100))
+        self._writes = 0
+        self._local = threading.local()
+
+    @property
+    def _db(self):
+        # Соединение на поток и на процесс: после fork чужое не трогаем.
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = self._connect()
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _connect(self):
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(
+            self._path,
+            timeout=self._busy_timeout,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute(f'PRAGMA mmap_size={self._mmap_size}')
+        connection.executescript(SCHEMA)
+        return connection
+
+    def _write(self, statements):
+        """Выполняет запросы одной транзакцией записи."""
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            results = [db.execute(sql, params) for sql, params in statements]
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return results
+
+    @staticmethod
+    def _dump(value):
+        if type(value) is int and value in INT_RANGE:
+            return value
+        return sqlite3.Binary(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+    @staticmethod
+    def _load(value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        now = time.time()
+        rows = []
+        for chunk in chunks(list(keys)):
+            rows += self._db.execute(
+                'SELECT key, value, accessed FROM cache '
+                f'WHERE key IN ({placeholders(chunk)}) AND {NOT_EXPIRED}',
+                (*chunk, now),
+            ).fetchall()
+        stale = [
+            key for key, value, accessed in rows
+            if accessed < now - self._access_resolution
+        ]
+        if stale:
+            self._write([
+                (f'UPDATE cache SET accessed = ? '
+                 f'WHERE key IN ({placeholders(chunk)})', (now, *chunk))
+                for chunk in chunks(stale)
+            ])
+        return {keys[key]: self._load(value) for key, value, accessed in rows}
+
+    def _store(self, items, timeout, mode):
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        if mode == 'add':
+            # Просроченная запись не мешает add: удаляем ее в той же
+            # транзакции.
+            statements = []
+            for key, value in items:
+                statements += [
+                    ('DELETE FROM cache WHERE key = ? AND NOT ' + NOT_EXPIRED,
+                     (key, now)),
+                    ('INSERT OR IGNORE INTO cache VALUES (?, ?, ?, ?)',
+                     (key, self._dump(value), expires, now)),
+                ]
+            results = self._write(statements)[1::2]
+        else:
+            results = self._write([
+                ('INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)',
+                 (key, self._dump(value), expires, now))
+                for key, value in items
+            ])
+        self._writes += len(items)
+        if self._writes >= self._cull_every:
+            self._writes = 0
+            self._cull()
+        return [cursor.rowcount == 1 for cursor in results]
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        return self._store([(key, value)], timeout, 'add')[0]
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._store([(self._key(key, version), value)], timeout, 'set')
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        self._store([
+            (self._key(key, version), value) for key, value in data.items()
+        ], timeout, 'set')
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor, = self._write([(
+            'UPDATE cache SET expires = ? WHERE key = ? AND ' + NOT_EXPIRED,
+            (self.get_backend_timeout(timeout), self._key(key, version),
+             time.time()),
+        )])
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            updated = db.execute(
+                'UPDATE cache SET value = value + ? WHERE key = ? '
+                "AND typeof(value) = 'integer' AND " + NOT_EXPIRED,
+                (delta, key, time.time()),
+            ).rowcount
+            value = db.execute(
+                'SELECT value FROM cache WHERE key = ?', (key,)).fetchone()
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        if not updated:
+            raise ValueError(f"Key '{key}' not found")
+        return value[0]
+
+    def has_key(self, key, version=None):
+        return self._db.execute(
+            'SELECT 1 FROM cache WHERE key = ? AND ' + NOT_EXPIRED,
+            (self._key(key, version), time.time()),
+        ).fetchone() is not None
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if keys:
+            self._write([
+                (f'DELETE FROM cache WHERE key IN ({placeholders(chunk)})',
+                 chunk)
+                for chunk in chunks(keys)
+            ])
+
+    def clear(self):
+        self._write([('DELETE FROM cache', ())])
+
+    def _cull(self):
+        """Удаляет просроченное и, при переполнении, давно не читанное."""
+        now = time.time()
+        self._write([('DELETE FROM cache WHERE expires <= ?', (now,))])
+        count, = self._db.execute('SELECT COUNT(*) FROM cache').fetchone()
+        if count <= self._max_entries:
+            return
+        if not self._cull_frequency:
+            self.clear()
+        else:
+            excess = max(
+                count - self._max_entries, count // self._cull_frequency)
+            self._write([(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY accessed LIMIT ?)',
+                (excess,),
+            )])
+
+    def close(self, **kwargs):
+        # Соединение переиспользуется между запросами одного потока.
+        pass
@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from .queries import QueryRecorder, plan_problems
+
+
+class QueryBudgetMixin:
+    """Проверки числа SQL-запросов для тестов Django."""
+
+    @contextmanager
+    def assertQueryBudget(self, budget, max_repeats=None):
+        """Не больше budget запросов и ни одной формы чаще max_repeats."""
+        with QueryRecorder() as recorder:
+            yield recorder
+        if len(recorder) > budget:
+            self.fail(
+                f'{len(recorder)} запросов при бюджете {budget}:\n'
+                f'{recorder.report()}')
+        if max_repeats is not None:
+            repeated = recorder.repeated(max_repeats + 1)
+            if repeated:
+                self.fail(
+                    f'Запросы повторяются больше {max_repeats} раз:\n'
+                    f'{recorder.report(repeated)}')
+
+    @contextmanager
+    def assertIndexedQueries(self, ignore=(), temp_sort=False):
+        """Все чтения в блоке идут по индексам и без временных сортировок.
+
+        Планы берутся из EXPLAIN QUERY PLAN после выполнения блока;
+        параметры - как у core.queries.plan_problems.
+        """
+        with QueryRecorder() as recorder:
+            yield recorder
+        problems = plan_problems(recorder, ignore, temp_sort)
+        if problems:
+            self.fail('Запросы без подходящего индекса:\n' + '\n'.join(
+                '{}\n    {}'.format(query['sql'], '\n    '.join(plan))
+                for query, plan in problems))
+
+
+class IsolatedCacheRunner(DiscoverRunner):
+    """Тесты работают с кэшами во временном каталоге.
+
+    Кэш по умолчанию - общий файл, который читает работающий сайт; тесты
+    пишут в него поколения и страницы и очищают его. На время прогона
+    каждый кэш получает свое расположение во временном каталоге, который
+    удаляется после тестов.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._cache_dir = tempfile.mkdtemp(prefix='test-cache-')
+        self._temp_caches = override_settings(CACHES={
+            alias: {
+                **config,
+                'LOCATION': os.path.join(self._cache_dir, alias),
+            }
+            for alias, config in settings.CACHES.items()
+        })
+        self._temp_caches.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._temp_caches.disable()
+        shutil.rmtree(self._cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
+
+
+class TestRunner(IsolatedCacheRunner):
+    """Тесты читают только из основной базы.
+
+    Реплика в тестах - зеркало основной (TEST MIRROR), но ее отдельное
+    соединение не видит данных из незавершенной транзакции теста, а в
+    других потоках оно открыло бы настоящий файл базы.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._primary_only = override_settings(READ_REPLICA=None)
+        self._primary_only.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._primary_only.disable()
+        super().teardown_test_environment(**kwargs)
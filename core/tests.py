@@ -1,4 +1,21 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+import time
+from multiprocessing import Process
+
+from django.contrib.auth.models import Permission
+from django.db import OperationalError, transaction
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import (
+    RequestFactory, SimpleTestCase, TestCase, override_settings)
+
+from core.db import routers
+from core.db.backends.sqlite3.base import DatabaseWrapper
+from core.middleware import ReadReplicaMiddleware
+from core.queries import QueryRecorder
+from core.sqlite_cache import SQLiteCache
 
 
 class ViewTestClass(TestCase):
@@ -6,3 +23,189 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, 404)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class QueryRecorderTests(TestCase):
+    def test_repeated_queries_point_to_template_line(self):
+        """Повторяющийся запрос из цикла шаблона помечается как N+1."""
+        template = Template(
+            '{% for perm in perms %}\n'
+            '{{ perm.content_type.app_label }}\n'
+            '{% endfor %}')
+        perms = Permission.objects.all()[:4]
+        with QueryRecorder() as recorder:
+            template.render(Context({'perms': perms}))
+        self.assertEqual(len(recorder), 5)
+        shape, = recorder.repeated(threshold=4)
+        self.assertEqual(shape.count, 4)
+        self.assertEqual(dict(shape.origins), {'<unknown source>:2': 4})
+
+
+def increment(path, times):
+    cache = SQLiteCache(path, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.path, {'OPTIONS': options})
+
+    def test_values_round_trip(self):
+        """Значения любых типов читаются так же, как были записаны."""
+        for value in (1, 2 ** 70, 'text', b'bytes', {'a': [1, 2]}, None):
+            self.cache.set('key', value)
+            self.assertEqual(self.cache.get('key', 'default'), value)
+
+    def test_timeout(self):
+        """Просроченная запись не читается и не мешает add."""
+        self.cache.set('key', 'old', timeout=0.05)
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertFalse(self.cache.has_key('key'))
+        self.assertTrue(self.cache.add('key', 'new'))
+        self.assertFalse(self.cache.add('key', 'newer'))
+        self.assertEqual(self.cache.get('key'), 'new')
+
+    def test_many(self):
+        """Пакетные операции не упираются в лимит параметров SQLite."""
+        cache = self.make_cache(MAX_ENTRIES=2000)
+        data = {f'key{i}': i for i in range(1200)}
+        cache.set_many(data)
+        self.assertEqual(cache.get_many(list(data) + ['nope']), data)
+        cache.delete_many(list(data))
+        self.assertEqual(cache.get_many(list(data)), {})
+
+    def test_incr(self):
+        self.cache.set('counter', 5)
+        self.assertEqual(self.cache.incr('counter', 3), 8)
+        self.assertEqual(self.cache.decr('counter'), 7)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_incr_is_atomic_across_processes(self):
+        """Инкременты из разных процессов не теряются."""
+        self.cache.set('counter', 0)
+        processes = [
+            Process(target=increment, args=(self.path, 50))
+            for _ in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+
+    def test_writes_are_visible_to_other_connections(self):
+        """Запись и сброс видны другому экземпляру (другому воркеру)."""
+        other = self.make_cache()
+        self.cache.set('key', 'value')
+        self.assertEqual(other.get('key'), 'value')
+        other.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_cull_evicts_least_recently_read(self):
+        """При переполнении вытесняются давно не читанные записи."""
+        cache = self.make_cache(
+            MAX_ENTRIES=10, CULL_FREQUENCY=2, CULL_EVERY=1,
+            ACCESS_RESOLUTION=0)
+        for i in range(10):
+            cache.set(f'key{i}', i)
+        cache.get('key0')
+        cache.set('key10', 10)
+        self.assertEqual(cache.get('key0'), 0)
+        self.assertEqual(cache.get('key10'), 10)
+        self.assertIsNone(cache.get('key1'))
+        self.assertLessEqual(len(cache.get_many(
+            [f'key{i}' for i in range(11)])), 10)
+
+
+@override_settings(READ_REPLICA='replica')
+class ReadReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = routers.ReadReplicaRouter()
+        self.factory = RequestFactory()
+
+    def read_alias(self):
+        return self.router.db_for_read(Permission)
+
+    def respond(self, request):
+        self.seen = self.read_alias()
+        return HttpResponse()
+
+    def test_reads_go_to_replica_outside_transactions(self):
+        """Чтение вне транзакции идет в реплику, запись - в основную."""
+        self.assertEqual(self.read_alias(), 'replica')
+        self.assertEqual(self.router.db_for_write(Permission), 'default')
+        with override_settings(READ_REPLICA=None):
+            self.assertEqual(self.read_alias(), 'default')
+        connection = transaction.get_connection()
+        connection.in_atomic_block = True
+        try:
+            self.assertEqual(self.read_alias(), 'default')
+        finally:
+            connection.in_atomic_block = False
+        with routers.use_primary():
+            self.assertEqual(self.read_alias(), 'default')
+
+    def test_middleware_sticks_writers_to_primary(self):
+        """После POST пользователь какое-то время читает из основной."""
+        middleware = ReadReplicaMiddleware(self.respond)
+        response = middleware(self.factory.get('/'))
+        self.assertEqual(self.seen, 'replica')
+        self.assertNotIn(ReadReplicaMiddleware.cookie, response.cookies)
+        with self.settings(READ_REPLICA_STICKY_SECONDS=10):
+            response = middleware(self.factory.post('/'))
+        self.assertEqual(self.seen, 'default')
+        cookie = response.cookies[ReadReplicaMiddleware.cookie]
+        self.assertEqual(cookie['max-age'], 10)
+        self.assertTrue(cookie['httponly'])
+        request = self.factory.get('/')
+        request.COOKIES[ReadReplicaMiddleware.cookie] = '1'
+        response = middleware(request)
+        self.assertEqual(self.seen, 'default')
+        self.assertNotIn(ReadReplicaMiddleware.cookie, response.cookies)
+
+
+class ReadOnlyBackendTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'db.sqlite3')
+
+    def connect(self, **options):
+        wrapper = DatabaseWrapper({
+            'NAME': self.path, 'OPTIONS': options, 'TIME_ZONE': None,
+            'CONN_MAX_AGE': 0, 'AUTOCOMMIT': True, 'ATOMIC_REQUESTS': False,
+        })
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def test_pragmas_and_read_only(self):
+        """PRAGMA применяются, а соединение только для чтения не пишет."""
+        primary = self.connect(pragmas={'journal_mode': 'WAL'})
+        with primary.cursor() as cursor:
+            cursor.execute('CREATE TABLE t (x)')
+            cursor.execute('INSERT INTO t VALUES (1)')
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+        replica = self.connect(read_only=True, pragmas={'query_only': 'ON'})
+        with replica.cursor() as cursor:
+            cursor.execute('SELECT x FROM t')
+            self.assertEqual(cursor.fetchall(), [(1,)])
+            with self.assertRaisesMessage(OperationalError, 'readonly'):
+                cursor.execute('INSERT INTO t VALUES (2)')
+
+    def test_read_only_uri(self):
+        self.assertEqual(
+            DatabaseWrapper.read_only_uri('/tmp/a b.sqlite3'),
+            'file:/tmp/a%20b.sqlite3?mode=ro')
+        self.assertEqual(
+            DatabaseWrapper.read_only_uri('file:db?cache=shared'),
+            'file:db?cache=shared&mode=ro')
@@ -1,20 +1,126 @@
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.views.main import PAGE_VAR
+from django.contrib.admin.widgets import AutocompleteSelect
 
+from . import search
 from .models import Comment, Follow, Group, Post
+from .paginators import EstimatedCountPaginator
 
 
-class PostAdmin(admin.ModelAdmin):
+class UsernameFilter(admin.ListFilter):
+    """Фильтр по точному имени пользователя в поле ввода.
+
+    Стандартный фильтр по внешнему ключу выводит в боковую панель всех
+    пользователей; здесь только поле ввода и поиск по индексу username.
+    """
+
+    template = 'admin/username_filter.html'
+    field = None
+
+    def __init__(self, request, params, model, model_admin):
+        super().__init__(request, params, model, model_admin)
+        # Без "__" в имени параметра: иначе admin проверит его как
+        # поиск по связанной модели, которого нет в list_filter.
+        self.parameter_name = self.field
+        self.value = params.pop(self.parameter_name, '')
+        if self.value:
+            self.used_parameters[self.parameter_name] = self.value
+
+    def has_output(self):
+        return True
+
+    def expected_parameters(self):
+        return [self.parameter_name]
+
+    def queryset(self, request, queryset):
+        if not self.value:
+            return queryset
+        return queryset.filter(**{f'{self.field}__username': self.value})
+
+    def choices(self, changelist):
+        yield {
+            'parameter_name': self.parameter_name,
+            'value': self.value,
+            'hidden': [
+                (key, value) for key, value in changelist.params.items()
+                if key not in (self.parameter_name, PAGE_VAR)
+            ],
+        }
+
+
+def username_filter(field, title):
+    return type(
+        f'{field.title()}UsernameFilter', (UsernameFilter,),
+        {'field': field, 'title': title})
+
+
+class RowAutocompleteSelect(AutocompleteSelect):
+    """Autocomplete, который берет выбранный объект из строки списка.
+
+    Стандартный виджет делает запрос за подписью выбранного значения в
+    каждой строке; в списке объект уже загружен через select_related.
+    """
+
+    selected = None
+
+    def optgroups(self, name, value, attr=None):
+        selected = self.selected
+        if selected is None or [str(v) for v in value] != [str(selected.pk)]:
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, '', '', False, 0))
+        options.append(self.create_option(
+            name, selected.pk, self.choices.field.label_from_instance(
+                selected), True, len(options)))
+        return [(None, options, 0)]
+
+
+class PostChangeListForm(forms.ModelForm):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        widget = self.fields['group'].widget.widget
+        widget.selected = self.instance.group
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    """Список без точного COUNT(*) по всей таблице."""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    empty_value_display = '-пусто-'
+
+
+class PostAdmin(ScalableAdmin):
     list_display = (
         'pk',
-        'text',
+        'excerpt',
         'pub_date',
         'author',
         'group',
     )
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    autocomplete_fields = ('author', 'group')
     search_fields = ('text',)
-    list_filter = ('pub_date',)
-    empty_value_display = '-пусто-'
+    list_filter = ('pub_date', username_filter('author', 'автору'))
+
+    def get_changelist_form(self, request, **kwargs):
+        return PostChangeListForm
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'group':
+            kwargs['widget'] = RowAutocompleteSelect(
+                db_field.remote_field, self.admin_site,
+                using=kwargs.get('using'))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по индексу FTS5 вместо LIKE '%...%' по всей таблице.
+        if not search.match_query(search_term):
+            return queryset, False
+        return search.filter_matching(queryset, search_term), False
 
 
 class GroupAdmin(admin.ModelAdmin):
@@ -29,18 +135,36 @@ class GroupAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
-class CommentAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'text', 'author', 'created')
-    search_fields = ('text', 'author')
-    list_filter = ('created',)
-    empty_value_display = '-пусто-'
+class CommentAdmin(ScalableAdmin):
+    list_display = ('pk', 'excerpt', 'author', 'created')
+    list_select_related = ('author',)
+    autocomplete_fields = ('post', 'author')
+    search_fields = ('=author__username',)
+    list_filter = ('created', username_filter('author', 'автору'))
+    # Сортировка по первичному ключу не требует сортировать всю таблицу.
+    ordering = ('-pk',)
 
+    def get_search_results(self, request, queryset, search_term):
+        # Имя автора целиком или слова самого комментария (FTS5).
+        by_author, use_distinct = super().get_search_results(
+            request, queryset, search_term)
+        if not search.match_query(search_term):
+            return by_author, use_distinct
+        return by_author | search.filter_matching(
+            queryset, search_term, table=search.COMMENTS_TABLE
+        ), use_distinct
 
-class FollowAdmin(admin.ModelAdmin):
+
+class FollowAdmin(ScalableAdmin):
     list_display = ('pk', 'user', 'author')
-    search_fields = ('user', 'author')
-    list_filter = ('user',)
-    empty_value_display = '-пусто-'
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
+    search_fields = ('=user__username', '=author__username')
+    list_filter = (
+        username_filter('user', 'подписчику'),
+        username_filter('author', 'автору'),
+    )
+    ordering = ('-pk',)
 
 
 admin.site.register(Post, PostAdmin)
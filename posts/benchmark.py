@@ -0,0 +1,205 @@
+"""Нагрузочный замер маршрутов posts через тестовый клиент Django.
+
+Каждый маршрут запрашивается анонимно (если он открыт) и от имени
+пользователя с подписками. Для каждой пары считаются перцентили
+задержки, среднее число SQL-запросов и пропускная способность.
+Клиент работает в том же процессе, поэтому сеть и сервер приложений в
+замер не входят: сравнивать имеет смысл прогоны одного и того же
+набора данных между версиями.
+"""
+import math
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from . import exports
+from .models import Comment, Follow, Group, Post, User
+
+PERCENTILES = (50, 95, 99)
+
+
+class Route:
+    """Маршрут замера; then - запрос, который выполняется следом в том
+    же замере (например, подписка после отписки возвращает данные),
+    before - что вызвать перед каждым запросом."""
+
+    def __init__(self, name, url, method='get', data=None, public=True,
+                 then=None, before=None):
+        self.name = name
+        self.url = url
+        self.method = method
+        self.data = data
+        self.public = public
+        self.then = then
+        self.before = before
+
+    def requests(self):
+        route = self
+        while route is not None:
+            yield route
+            route = route.then
+
+
+class QueryCounter:
+    """Считает запросы ко всем базам без записи их текста."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+
+def percentile(values, rank):
+    """Перцентиль по методу ближайшего ранга; values отсортированы."""
+    return values[max(0, math.ceil(rank / 100 * len(values)) - 1)]
+
+
+def sample():
+    """Пользователь с наибольшим числом подписок и объекты для URL."""
+    user_id = Follow.objects.values('user').annotate(
+        follows=Count('pk')).order_by('-follows').values_list(
+        'user', flat=True).first()
+    if user_id is None:
+        return None
+    user = User.objects.get(pk=user_id)
+    post = Post.objects.filter(pk=Comment.objects.order_by(
+        '-pk').values_list('post', flat=True).first()).first()
+    return {
+        'user': user,
+        'author': Post.objects.order_by('-pk').values_list(
+            'author__username', flat=True).first(),
+        'group': Group.objects.filter(posts__isnull=False).values_list(
+            'slug', flat=True).first(),
+        'post': post or Post.objects.order_by('-pk').first(),
+        'own_post': user.posts.order_by('-pk').first(),
+        'followed': user.follower.values_list(
+            'author__username', flat=True).first(),
+    }
+
+
+def routes(objects, writes=False):
+    """Маршруты posts/urls.py с аргументами из набора данных."""
+    post_id = objects['post'].pk
+    found = [
+        Route('index', reverse('posts:index')),
+        Route('index?page=2', reverse('posts:index') + '?page=2'),
+        Route('index?page=50', reverse('posts:index') + '?page=50'),
+        Route('search', reverse('posts:search') + '?q=телефон'),
+        Route('post_detail', reverse('posts:post_detail', args=(post_id,))),
+        Route('post_comments', reverse(
+            'posts:post_comments', args=(post_id,)) + '?format=json'),
+        Route('follow_index', reverse('posts:follow_index'), public=False),
+        Route('post_create', reverse('posts:post_create'), public=False),
+    ]
+    if objects['author']:
+        found.append(Route('profile', reverse(
+            'posts:profile', args=(objects['author'],))))
+
+        def reset_exports():
+            # Выгрузку можно начинать раз в EXPORT_INTERVAL секунд;
+            # анонимный тестовый клиент приходит с адреса 127.0.0.1.
+            for client in (objects['user'].pk, '127.0.0.1'):
+                exports.reset(client)
+
+        found.append(Route('profile_export', reverse(
+            'posts:profile_export', args=(objects['author'],)),
+            before=reset_exports))
+    if objects['group']:
+        found.append(Route('group_list', reverse(
+            'posts:group_list', args=(objects['group'],))))
+    if objects['own_post']:
+        found.append(Route('post_edit', reverse(
+            'posts:post_edit', args=(objects['own_post'].pk,)),
+            public=False))
+    if writes:
+        found.append(Route(
+            'add_comment', reverse('posts:add_comment', args=(post_id,)),
+            method='post', data={'text': 'Замер'}, public=False))
+        if objects['followed']:
+            username = objects['followed']
+            found.append(Route(
+                'profile_unfollow+follow',
+                reverse('posts:profile_unfollow', args=(username,)),
+                public=False,
+                then=Route(
+                    'profile_follow',
+                    reverse('posts:profile_follow', args=(username,)))))
+    return found
+
+
+def measure(client, route, requests, warmup):
+    """Замер одного маршрута; возвращает словарь с результатами."""
+    def request():
+        codes = []
+        for step in route.requests():
+            if step.before is not None:
+                step.before()
+            response = getattr(client, step.method)(step.url, step.data)
+            if response.streaming:
+                # Запросы к базе идут при чтении потока.
+                b''.join(response.streaming_content)
+            codes.append(response.status_code)
+        return codes
+
+    for _ in range(warmup):
+        request()
+    latencies = []
+    queries = 0
+    statuses = set()
+    for _ in range(requests):
+        with QueryCounter() as counter:
+            started = time.perf_counter()
+            codes = request()
+            latencies.append(time.perf_counter() - started)
+        queries += counter.count
+        statuses.update(codes)
+    latencies.sort()
+    result = {
+        f'p{rank}_ms': round(percentile(latencies, rank) * 1000, 3)
+        for rank in PERCENTILES
+    }
+    result.update({
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+        'queries': round(queries / requests, 2),
+        'rps': round(len(latencies) / sum(latencies), 1),
+        'statuses': sorted(statuses),
+    })
+    return result
+
+
+def run(requests=50, warmup=5, writes=False):
+    """Замеряет все маршруты; возвращает список результатов."""
+    objects = sample()
+    if objects is None:
+        raise ValueError('Нет подписок: сначала создайте данные (seed).')
+    anonymous = Client()
+    authorized = Client()
+    authorized.force_login(objects['user'])
+    results = []
+    for route in routes(objects, writes):
+        clients = [('user', authorized)]
+        if route.public:
+            clients.insert(0, ('anonymous', anonymous))
+        for visitor, client in clients:
+            results.append({
+                'route': route.name,
+                'visitor': visitor,
+                'url': route.url,
+                **measure(client, route, requests, warmup),
+            })
+    return results
@@ -0,0 +1,65 @@
+"""Кэш HTML карточек постов (posts/includes/post_layout.html).
+
+Карточка одного поста одинакова для всех читателей, поэтому ее HTML
+кэшируется отдельно от страниц: после изменения одного поста страница
+ленты перерисовывает только его карточку. Карточки страницы читаются
+одним get_many, промахи рендерятся и пишутся одним set_many.
+
+Ключ строится из id поста, его поля updated (сохранение поста, в том
+числе смена группы в post_edit, его сдвигает) и всего, что в карточке
+приходит не из самого поста: числа комментариев, имени автора, ссылки
+и названия группы. Такие ключи не нужно сбрасывать - старые записи
+просто больше не запрашиваются. Карточки с недостроенными миниатюрами
+не кэшируются: в них заглушка, а рендеринг ставит миниатюры в очередь.
+"""
+import hashlib
+
+from django.core.cache import cache
+
+from . import thumbnails
+
+from yatube.settings import POST_CARD_TIMEOUT
+
+
+def cacheable(post):
+    return None not in getattr(post, 'thumbnails', {}).values()
+
+
+def key(post, group_flag=False):
+    group = post.group
+    version = '|'.join(map(str, (
+        post.updated.timestamp(),
+        getattr(post, 'comment_count', None),
+        post.author.username,
+        group.slug if group else '',
+        group.title if group else '',
+    )))
+    return 'post-card:{}:{:d}:{}'.format(
+        post.pk, bool(group_flag),
+        hashlib.md5(version.encode()).hexdigest())
+
+
+def render_many(posts, render, group_flag=False):
+    """HTML карточек постов по порядку; render(post) рисует промах."""
+    posts = list(posts)
+    unattached = [
+        post for post in posts
+        if post.image and not hasattr(post, 'thumbnails')]
+    if unattached:
+        thumbnails.attach(unattached)
+    keys = {
+        post.pk: key(post, group_flag) for post in posts if cacheable(post)}
+    found = cache.get_many(list(keys.values()))
+    cards, missed = [], {}
+    for post in posts:
+        card_key = keys.get(post.pk)
+        if card_key in found:
+            cards.append(found[card_key])
+            continue
+        card = render(post)
+        cards.append(card)
+        if card_key is not None:
+            missed[card_key] = card
+    if missed:
+        cache.set_many(missed, POST_CARD_TIMEOUT)
+    return cards
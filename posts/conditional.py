@@ -0,0 +1,92 @@
+"""Условные GET-запросы (ETag и Last-Modified) для лент и страницы поста.
+
+Валидаторы считаются до view и не читают из базы ни строк страницы, ни
+агрегатов: это поколения кэша, которые сигналы уже сдвигают при каждом
+изменении видимого контента (кэш страниц по пути и фрагменты по
+областям), и время их последнего сдвига. Совпадение с If-None-Match или
+If-Modified-Since отвечается 304 без рендеринга шаблона. Для вошедших
+пользователей ETag свой: в странице их имя, CSRF-токен и подписки.
+"""
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.views.decorators.http import condition
+
+from . import feeds, generations, page_cache
+
+
+def index_scopes(request):
+    return [generations.GLOBAL]
+
+
+def profile_scopes(request, username):
+    if request.user.is_authenticated:
+        # Кнопка подписки зависит от подписок читателя.
+        return [generations.scope('feed', request.user.pk)]
+    return []
+
+
+def post_detail_scopes(request, post_id):
+    return page_cache.post_author_scopes(post_id)
+
+
+def pull_authors(request):
+    """Авторы ленты, читаемые при запросе; один раз за запрос."""
+    if not hasattr(request, '_pull_authors'):
+        request._pull_authors = feeds.pull_author_ids(request.user)
+    return request._pull_authors
+
+
+def follow_scopes(request):
+    """Области ленты подписок: их число не зависит от числа подписок."""
+    return generations.feed_scopes(request.user, pull_authors(request))
+
+
+def validators(request, scopes):
+    """(ETag, Last-Modified) страницы по поколениям ее областей.
+
+    Кроме переданных областей учитывается поколение пути из кэша
+    страниц: его сбрасывают изменения постов, комментариев и подписок,
+    видимые по этому адресу. Если областей не узнать (scopes - None),
+    валидаторов нет и ответ полный.
+    """
+    if scopes is None:
+        return None, None
+    scopes = [
+        page_cache.ALL_PAGES, page_cache.path_scope(request.path), *scopes]
+    parts = [generations.versions(*scopes)]
+    if request.user.is_authenticated:
+        parts += [
+            str(request.user.pk),
+            request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+        ]
+    return (
+        hashlib.md5('|'.join(parts).encode()).hexdigest(),
+        datetime.fromtimestamp(
+            generations.last_changed(*scopes), timezone.utc),
+    )
+
+
+def conditional_view(get_scopes=None):
+    """Декоратор view: ETag и Last-Modified по областям страницы.
+
+    get_scopes(request, *args, **kwargs) возвращает области поколений
+    сверх пути страницы.
+    """
+    def decorator(view):
+        def cached(request, *args, **kwargs):
+            if not hasattr(request, '_validators'):
+                request._validators = validators(
+                    request,
+                    [] if get_scopes is None
+                    else get_scopes(request, *args, **kwargs))
+            return request._validators
+
+        return wraps(view)(condition(
+            etag_func=lambda *args, **kwargs: cached(*args, **kwargs)[0],
+            last_modified_func=(
+                lambda *args, **kwargs: cached(*args, **kwargs)[1]),
+        )(view))
+    return decorator
@@ -0,0 +1,125 @@
+"""Потоковая выгрузка каталога производителя в CSV и JSONL.
+
+Посты читаются keyset-пачками по индексу (author, pub_date, id), и
+каждая пачка уходит клиенту одним куском, поэтому память не растет с
+размером каталога, а соединение с базой не держит транзакцию между
+пачками. Выгрузка занимает воркер, пока клиент ее читает, поэтому
+одновременных выгрузок не больше EXPORT_CONCURRENCY (слоты в общем
+кэше), а один посетитель может начинать новую не чаще раза в
+EXPORT_INTERVAL секунд.
+"""
+import csv
+import json
+
+from django.core.cache import cache
+from django.db.models import Q
+
+from .models import Comment, Post, count_of
+from .storage import post_images
+
+from yatube.settings import (
+    EXPORT_CHUNK_SIZE, EXPORT_CONCURRENCY, EXPORT_INTERVAL,
+    EXPORT_SLOT_TIMEOUT)
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+COLUMNS = ('id', 'text', 'group', 'image', 'pub_date', 'comments')
+
+
+def rows(author_id, chunk_size=EXPORT_CHUNK_SIZE):
+    """Посты автора от новых к старым кортежами в порядке COLUMNS."""
+    queryset = Post.objects.filter(author=author_id).annotate(
+        comment_count=count_of(Comment.objects.all(), 'post'),
+    ).order_by('-pub_date', '-pk').values_list(
+        'pk', 'text', 'group__slug', 'image', 'pub_date', 'comment_count')
+    chunk = list(queryset[:chunk_size])
+    while chunk:
+        yield from chunk
+        if len(chunk) < chunk_size:
+            return
+        pk, pub_date = chunk[-1][0], chunk[-1][4]
+        chunk = list(queryset.filter(
+            Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk)
+        )[:chunk_size])
+
+
+class Echo:
+    """Файлоподобный объект для csv.writer: строка возвращается, а не
+    пишется."""
+
+    def write(self, value):
+        return value
+
+
+def lines(author_id, file_format, absolute_url, chunk_size=EXPORT_CHUNK_SIZE):
+    """Куски выгрузки: заголовок CSV и по одному куску на пачку постов.
+
+    absolute_url превращает путь картинки в полный адрес.
+    """
+    writer = csv.writer(Echo())
+    if file_format == 'csv':
+        yield writer.writerow(COLUMNS)
+    batch = []
+    for pk, text, group, image, pub_date, comments in rows(
+            author_id, chunk_size):
+        record = (
+            pk, text, group or '',
+            absolute_url(post_images.url(image)) if image else '',
+            pub_date.isoformat(), comments)
+        batch.append(
+            writer.writerow(record) if file_format == 'csv'
+            else json.dumps(dict(zip(COLUMNS, record)), ensure_ascii=False)
+            + '\n')
+        if len(batch) == chunk_size:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+def acquire(client):
+    """Ключ слота выгрузки или None, если выгружать сейчас нельзя.
+
+    client - кто выгружает (пользователь или адрес); слот освобождает
+    release, а если воркер умер посреди выгрузки - время жизни ключа.
+    """
+    client_key = f'export:client:{client}'
+    if not cache.add(client_key, 1, EXPORT_INTERVAL):
+        return None
+    for number in range(EXPORT_CONCURRENCY):
+        slot = f'export:slot:{number}'
+        if cache.add(slot, 1, EXPORT_SLOT_TIMEOUT):
+            return slot
+    cache.delete(client_key)
+    return None
+
+
+def reset(client):
+    """Снимает для client ограничение частоты (замеры, тесты)."""
+    cache.delete(f'export:client:{client}')
+
+
+def release(slot):
+    cache.delete(slot)
+
+
+class Stream:
+    """Куски выгрузки для StreamingHttpResponse.
+
+    Django закрывает ответ после отправки или обрыва соединения, и
+    close освобождает слот, даже если чтение так и не началось (у
+    генератора, который не запускали, finally не выполняется).
+    """
+
+    def __init__(self, chunks, slot):
+        self.chunks = chunks
+        self.slot = slot
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def close(self):
+        self.chunks.close()
+        release(self.slot)
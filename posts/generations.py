@@ -0,0 +1,90 @@
+"""Поколения кэша для точной инвалидации фрагментов.
+
+У каждой области (вся лента, группа, автор, лента подписок, пост,
+комментарии поста) есть счетчик в кэше. Ключи фрагментов строятся из
+счетчиков своих областей, поэтому фрагменты живут часами, а изменение
+контента просто увеличивает счетчик - старые записи больше никто не
+запросит и они вытесняются.
+"""
+import time
+
+from django.core.cache import cache
+
+GLOBAL = 'global'
+# Все ленты подписок: редкие изменения карточек повсюду (переименования).
+FEEDS = 'feeds'
+
+
+def scope(name, pk):
+    return f'{name}:{pk}'
+
+
+def _key(name):
+    return f'gen:{name}'
+
+
+def _changed_key(name):
+    return f'gen-changed:{name}'
+
+
+def _fresh():
+    # Потерянный счетчик начинается со значения больше любого прежнего,
+    # чтобы не воскресить фрагменты, закэшированные до вытеснения.
+    return int(time.time() * 1000000)
+
+
+def versions(*scopes):
+    """Текущие поколения областей одной строкой для ключа фрагмента."""
+    keys = [_key(name) for name in scopes]
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        for key in missing:
+            cache.add(key, _fresh(), None)
+        found.update(cache.get_many(missing))
+    return '.'.join(str(found.get(key, 0)) for key in keys)
+
+
+def bump(*scopes):
+    """Сдвигает поколения областей после изменения их контента."""
+    now = time.time()
+    for name in set(scopes):
+        try:
+            cache.incr(_key(name))
+        except ValueError:
+            cache.add(_key(name), _fresh(), None)
+    cache.set_many({_changed_key(name): now for name in scopes}, None)
+
+
+def last_changed(*scopes):
+    """Время (timestamp) последнего сдвига любой из областей.
+
+    Если время области потеряно, оно считается текущим: лишний полный
+    ответ лучше, чем 304 на изменившуюся страницу.
+    """
+    keys = [_changed_key(name) for name in scopes]
+    found = cache.get_many(keys)
+    now = time.time()
+    for key in keys:
+        if key not in found:
+            cache.add(key, now, None)
+            found[key] = now
+    return max(found.values(), default=None)
+
+
+def post_scopes(author_id, group_id, post_id=None):
+    """Области, в которых показывается карточка поста."""
+    scopes = [GLOBAL, scope('author', author_id)]
+    if group_id is not None:
+        scopes.append(scope('group', group_id))
+    if post_id is not None:
+        scopes.append(scope('post', post_id))
+    return scopes
+
+
+def feed_scopes(user, pull_author_ids):
+    """Лента подписок: ее поколение сдвигают подписки и посты авторов,
+    раскладываемых при записи; посты авторов, читаемых при запросе,
+    отслеживаются по их областям (таких авторов немного)."""
+    return [scope('feed', user.pk), FEEDS] + [
+        scope('author', author_id) for author_id in pull_author_ids]
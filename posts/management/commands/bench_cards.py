@@ -0,0 +1,87 @@
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.template import Context, engines
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from posts import cards
+from posts.models import Group, Post, User
+
+VARIANTS = {
+    'include': (
+        "{% for post in posts %}"
+        "{% include 'posts/includes/post_layout.html' %}"
+        "{% if not forloop.last %}<hr>{% endif %}"
+        "{% endfor %}"),
+    'post_cards': '{% load post_cards %}{% post_cards posts %}',
+}
+
+
+def sample_posts(count):
+    """Несохраненные посты: замеряется рендеринг, а не чтение из базы."""
+    author = User(pk=1, username='author')
+    group = Group(pk=1, title='Группа', slug='group')
+    now = timezone.now()
+    posts = [
+        Post(pk=i, author=author, group=group if i % 2 else None,
+             text=f'Пост {i}\nвторая строка', pub_date=now, updated=now)
+        for i in range(1, count + 1)
+    ]
+    for post in posts:
+        post.render_text()
+    return posts
+
+
+def measure(variant, posts, repeat, cold=False):
+    """Секунды на один рендеринг списка и сам результат.
+
+    cold - перед каждым рендерингом карточки удаляются из кэша.
+    """
+    template = engines['django'].engine.from_string(VARIANTS[variant])
+    keys = [cards.key(post) for post in posts]
+    html = template.render(Context({'posts': posts}))
+    elapsed = 0
+    for _ in range(repeat):
+        if cold:
+            cache.delete_many(keys)
+        started = time.perf_counter()
+        template.render(Context({'posts': posts}))
+        elapsed += time.perf_counter() - started
+    cache.delete_many(keys)
+    return elapsed / repeat, html
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает рендеринг списка карточек через {% include %} в '
+            'цикле и тегом {% post_cards %} без кэша карточек и с ним.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts', type=int, default=10,
+            help='Сколько карточек в списке.')
+        parser.add_argument(
+            '--repeat', type=int, default=500,
+            help='Сколько раз отрендерить список.')
+
+    def handle(self, *args, **options):
+        posts = sample_posts(options['posts'])
+        # Без DEBUG шаблоны кэширует загрузчик, как в продакшене.
+        with override_settings(DEBUG=False):
+            results = {
+                'include': measure('include', posts, options['repeat']),
+                'cards cold': measure(
+                    'post_cards', posts, options['repeat'], cold=True),
+                'cards warm': measure(
+                    'post_cards', posts, options['repeat']),
+            }
+        if len({html for _, html in results.values()}) != 1:
+            self.stderr.write('Варианты отрендерили разный HTML.')
+        self.stdout.write('{:<12}{:>12}{:>10}'.format(
+            'variant', 'ms/list', 'speedup'))
+        baseline = results['include'][0]
+        for variant, (seconds, _) in results.items():
+            self.stdout.write(
+                f'{variant:<12}{seconds * 1000:>12.3f}'
+                f'{baseline / seconds:>10.2f}')
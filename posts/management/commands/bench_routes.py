@@ -0,0 +1,64 @@
+import json
+import platform
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from posts import benchmark
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class Command(BaseCommand):
+    help = ('Замеряет задержку (p50/p95/p99), число запросов и '
+            'пропускную способность маршрутов posts.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Сколько замеренных запросов на маршрут.')
+        parser.add_argument(
+            '--warmup', type=int, default=5,
+            help='Сколько запросов сделать до замера.')
+        parser.add_argument(
+            '--writes', action='store_true',
+            help='Замерять и изменяющие маршруты (комментарий, подписка).')
+        parser.add_argument(
+            '--output', help='Куда сохранить результаты в JSON.')
+        parser.add_argument(
+            '--debug', action='store_true',
+            help='Не выключать DEBUG (инспектор запросов замедляет ответы).')
+
+    def handle(self, *args, **options):
+        with override_settings(DEBUG=options['debug']):
+            try:
+                results = benchmark.run(
+                    options['requests'], options['warmup'],
+                    options['writes'])
+            except ValueError as error:
+                raise CommandError(error)
+        self.stdout.write('{:<26}{:<11}{:>9}{:>9}{:>9}{:>9}{:>9}'.format(
+            'route', 'visitor', 'p50 ms', 'p95 ms', 'p99 ms', 'queries',
+            'rps'))
+        for result in results:
+            self.stdout.write(
+                '{route:<26}{visitor:<11}{p50_ms:>9.1f}{p95_ms:>9.1f}'
+                '{p99_ms:>9.1f}{queries:>9}{rps:>9.1f}'.format(**result))
+        if options['output']:
+            report = {
+                'created': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'options': {
+                    key: options[key]
+                    for key in ('requests', 'warmup', 'writes', 'debug')},
+                'dataset': {
+                    model._meta.model_name: model.objects.count()
+                    for model in (User, Group, Post, Comment, Follow)},
+                'results': results,
+            }
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                json.dump(report, stream, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(
+                f'Результаты сохранены в {options["output"]}'))
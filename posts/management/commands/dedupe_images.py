@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from sorl.thumbnail import delete as delete_with_thumbnails
+
+from posts import generations, page_cache, storage
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Переносит картинки постов в контентно-адресуемое хранилище '
+            'и сверяет счетчики ссылок.')
+
+    def handle(self, *args, **options):
+        names = list(Post.objects.exclude(image='').order_by().values_list(
+            'image', flat=True).distinct())
+        moved = 0
+        for name in names:
+            if storage.is_addressed(name):
+                continue
+            if not storage.post_images.exists(name):
+                self.stdout.write(f'Нет файла: {name}')
+                continue
+            with storage.post_images.open(name) as source:
+                new_name = storage.post_images.save(name, source)
+            posts = list(Post.objects.filter(image=name).values(
+                'pk', 'author', 'group', 'author__username', 'group__slug'))
+            Post.objects.filter(image=name).update(
+                image=new_name, updated=timezone.now())
+            # Старые миниатюры строились от хранилища по умолчанию.
+            delete_with_thumbnails(name)
+            for post in posts:
+                generations.bump(*generations.post_scopes(
+                    post['author'], post['group'], post['pk']))
+                page_cache.purge_post(
+                    post['pk'], post['author__username'],
+                    [post['group__slug']])
+            moved += 1
+            self.stdout.write(f'{name} -> {new_name}')
+        drift = storage.recount()
+        for name, (old, new) in drift.items():
+            self.stdout.write(f'{name}: ссылок {old} -> {new}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено файлов: {moved}, исправлено счетчиков: '
+            f'{len(drift)}. Миниатюры создаст warm_thumbnails.'))
@@ -0,0 +1,33 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = ('Выгружает пользователей, группы, посты, комментарии и '
+            'подписки в файлы JSONL или CSV.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Куда положить файлы.')
+        parser.add_argument(
+            '--format', choices=transfer.FORMATS, default='jsonl')
+        parser.add_argument(
+            '--tables', nargs='+', choices=transfer.TABLE_NAMES,
+            default=transfer.TABLE_NAMES, help='Какие таблицы выгрузить.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=transfer.CHUNK_SIZE,
+            help='Сколько строк читать из базы за раз.')
+
+    def handle(self, *args, **options):
+        os.makedirs(options['directory'], exist_ok=True)
+        for name in options['tables']:
+            table = transfer.table(name)
+            target = transfer.path(
+                options['directory'], table, options['format'])
+            with open(target, 'w', newline='', encoding='utf-8') as stream:
+                count = transfer.write(
+                    table, stream, options['format'], options['chunk_size'])
+            self.stdout.write(f'{target}: {count}')
+        self.stdout.write(self.style.SUCCESS('Выгрузка завершена'))
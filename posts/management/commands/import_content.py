@@ -0,0 +1,54 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = ('Загружает файлы export_content пачками; прерванную загрузку '
+            'можно продолжить тем же вызовом.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Где лежат файлы.')
+        parser.add_argument(
+            '--format', choices=transfer.FORMATS, default='jsonl')
+        parser.add_argument(
+            '--tables', nargs='+', choices=transfer.TABLE_NAMES,
+            default=transfer.TABLE_NAMES, help='Какие таблицы загрузить.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=transfer.CHUNK_SIZE,
+            help='Сколько строк вставлять за раз.')
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Не продолжать с контрольных точек, а начать сначала.')
+        parser.add_argument(
+            '--no-rebuild', action='store_true',
+            help='Не пересчитывать счетчики, ленты и поисковый индекс.')
+
+    def handle(self, *args, **options):
+        # Порядок TABLES: сначала те, на кого ссылаются.
+        names = [
+            name for name in transfer.TABLE_NAMES
+            if name in options['tables']]
+        for name in names:
+            table = transfer.table(name)
+            source = transfer.path(
+                options['directory'], table, options['format'])
+            if not os.path.exists(source):
+                self.stdout.write(f'Нет файла {source}, пропускаю')
+                continue
+            started = time.monotonic()
+            done, skipped = transfer.load(
+                table, source, options['format'], options['chunk_size'],
+                resume=not options['restart'])
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f'{source}: строк {done}, пропущено {skipped}, '
+                f'{done / elapsed if elapsed else done:.0f} строк/с')
+        if not options['no_rebuild']:
+            # Пачки вставляются без сигналов: производные данные
+            # собираются заново.
+            transfer.rebuild_derived(self.stdout)
+        self.stdout.write(self.style.SUCCESS('Загрузка завершена'))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import feeds
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает материализованные ленты подписок с нуля.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*',
+            help='Чьи ленты пересобрать (по умолчанию - всех).')
+
+    def handle(self, *args, **options):
+        if not options['usernames']:
+            entries = feeds.rebuild_all()
+            self.stdout.write(self.style.SUCCESS(
+                f'Пересобраны все ленты, записей: {entries}'))
+            return
+        users = User.objects.order_by('pk').filter(
+            username__in=options['usernames'])
+        if users.count() != len(set(options['usernames'])):
+            raise CommandError('Не все пользователи найдены.')
+        rebuilt = 0
+        for user_id in users.values_list('pk', flat=True).iterator():
+            feeds.rebuild(user_id)
+            rebuilt += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересобрано лент: {rebuilt}'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from posts import rendering
+from posts.models import Comment, Post
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает готовый HTML и выдержки текста постов и '
+            'комментариев.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=rendering.BATCH_SIZE,
+            help='Сколько строк обновлять за раз.')
+
+    def handle(self, *args, **options):
+        for model in (Post, Comment):
+            count = rendering.rebuild(model, options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f'{model._meta.verbose_name_plural}: {count}'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from posts import stats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики AuthorStats пачками и сообщает о дрейфе.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько пользователей пересчитывать за раз.')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать расхождения, ничего не исправлять.')
+
+    def handle(self, *args, **options):
+        checked = drifted = 0
+        for size, drift in stats.recount_all(
+                options['batch_size'], fix=not options['dry_run']):
+            checked += size
+            drifted += len(drift)
+            for user_id, fields in drift.items():
+                self.stdout.write('{}: {}'.format(user_id, ', '.join(
+                    f'{field} {old} -> {new}'
+                    for field, (old, new) in fields.items())))
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено: {checked}, с расхождениями: {drifted}'))
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import seed, transfer
+
+
+class Command(BaseCommand):
+    help = ('Создает синтетический набор данных: пользователей, группы, '
+            'посты с картинками, комментарии и подписки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Среднее число подписок пользователя.')
+        parser.add_argument(
+            '--image-share', type=float, default=0.2,
+            help='Доля постов с картинкой.')
+        parser.add_argument(
+            '--alpha', type=float, default=1.1,
+            help='Показатель степенного закона популярности авторов.')
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней распределить посты.')
+        parser.add_argument('--random-seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        created = seed.seed(
+            users=options['users'],
+            groups=options['groups'],
+            posts=options['posts'],
+            comments=options['comments'],
+            follows=options['follows'],
+            image_share=options['image_share'],
+            alpha=options['alpha'],
+            days=options['days'],
+            random_seed=options['random_seed'],
+        )
+        for name, count in created.items():
+            self.stdout.write(f'{name}: {count}')
+        transfer.rebuild_derived(self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.monotonic() - started:.1f} с. Пароль '
+            f'пользователей: {seed.PASSWORD}'))
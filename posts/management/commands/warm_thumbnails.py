@@ -0,0 +1,51 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts import generations, page_cache, thumbnails
+from posts.models import Post
+
+
+def warm(post):
+    return post, thumbnails.generate(post['image'])
+
+
+def warm_in_thread(post):
+    try:
+        return warm(post)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Создает недостающие миниатюры картинок постов параллельно.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int,
+            default=getattr(settings, 'THUMBNAIL_WORKERS', 2),
+            help='Сколько потоков генерации запустить (1 - без потоков).')
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').values(
+            'pk', 'image', 'author', 'group', 'author__username',
+            'group__slug').order_by('pk')
+        checked = created = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            results = (
+                pool.map(warm_in_thread, posts.iterator())
+                if options['workers'] > 1 else map(warm, posts.iterator()))
+            for post, count in results:
+                checked += 1
+                if not count:
+                    continue
+                created += count
+                generations.bump(*generations.post_scopes(
+                    post['author'], post['group'], post['pk']))
+                page_cache.purge_post(
+                    post['pk'], post['author__username'],
+                    [post['group__slug']])
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено постов: {checked}, создано миниатюр: {created}'))
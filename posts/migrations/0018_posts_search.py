@@ -0,0 +1,44 @@
+from django.db import migrations
+
+from posts.search import BATCH_SIZE, terms
+
+
+def fill_index(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    last_pk = 0
+    while True:
+        batch = list(Post.objects.filter(pk__gt=last_pk).order_by(
+            'pk').values_list('pk', 'text')[:BATCH_SIZE])
+        if not batch:
+            return
+        comments = {}
+        for post_id, text in Comment.objects.filter(
+                post__in=[pk for pk, _ in batch]).order_by(
+                'post', '-created').values_list('post', 'text'):
+            comments.setdefault(post_id, []).append(text)
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(
+                'INSERT INTO posts_search (rowid, text, comments) '
+                'VALUES (%s, %s, %s)',
+                [
+                    (pk, terms(text), terms(' '.join(comments.get(pk, ()))))
+                    for pk, text in batch
+                ])
+        last_pk = batch[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_storedimage'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "CREATE VIRTUAL TABLE posts_search USING fts5("
+            "text, comments, tokenize='unicode61 remove_diacritics 0')",
+            'DROP TABLE posts_search',
+        ),
+        migrations.RunPython(fill_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 2.2.19 on 2026-10-18 03:29
+
+from django.db import migrations, models
+
+from posts import rendering
+
+
+def fill_rendered_text(apps, schema_editor):
+    for name in ('Post', 'Comment'):
+        rendering.rebuild(apps.get_model('posts', name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_post_updated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='excerpt',
+            field=models.TextField(default='', editable=False, verbose_name='Выдержка'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='text_html',
+            field=models.TextField(default='', editable=False, verbose_name='HTML текста'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.TextField(default='', editable=False, verbose_name='Выдержка'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='text_html',
+            field=models.TextField(default='', editable=False, verbose_name='HTML текста'),
+        ),
+        migrations.RunPython(fill_rendered_text, migrations.RunPython.noop),
+    ]
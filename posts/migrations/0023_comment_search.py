@@ -0,0 +1,35 @@
+from django.db import migrations
+
+from posts.search import BATCH_SIZE, terms
+
+
+def fill_index(apps, schema_editor):
+    Comment = apps.get_model('posts', 'Comment')
+    last_pk = 0
+    while True:
+        batch = list(Comment.objects.filter(pk__gt=last_pk).order_by(
+            'pk').values_list('pk', 'text')[:BATCH_SIZE])
+        if not batch:
+            return
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(
+                'INSERT INTO posts_comment_search (rowid, text) '
+                'VALUES (%s, %s)',
+                [(pk, terms(text)) for pk, text in batch])
+        last_pk = batch[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0022_rendered_text'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "CREATE VIRTUAL TABLE posts_comment_search USING fts5("
+            "text, tokenize='unicode61 remove_diacritics 0')",
+            'DROP TABLE posts_comment_search',
+        ),
+        migrations.RunPython(fill_index, migrations.RunPython.noop),
+    ]
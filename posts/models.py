@@ -1,9 +1,43 @@
 from django.db import models
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
+from django.db.models.query import ModelIterable
+
+from . import rendering, thumbnails
+from .storage import post_images
 
 User = get_user_model()
 
 
+def count_of(queryset, field, outer='pk'):
+    """Коррелированный подзапрос COUNT(*) по внешнему ключу field."""
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef(outer)}).order_by().values(
+            field).annotate(count=Count('pk')).values('count'),
+        output_field=models.IntegerField(),
+    ), 0)
+
+
+def stat_of(field, queryset, fk, prefix=''):
+    """Счетчик из AuthorStats, а если строки еще нет - живой COUNT."""
+    return Coalesce(
+        F(f'{prefix}stats__{field}'),
+        count_of(queryset, fk, outer=f'{prefix}pk'),
+    )
+
+
+def authors_with_stats():
+    """Пользователи с числом постов, подписчиков и подписок."""
+    return User.objects.annotate(
+        posts_count=stat_of('posts_count', Post.objects.all(), 'author'),
+        followers_count=stat_of(
+            'followers_count', Follow.objects.all(), 'author'),
+        following_count=stat_of(
+            'following_count', Follow.objects.all(), 'user'),
+    )
+
+
 class Group(models.Model):
     title = models.CharField('Производитель', max_length=200)
     slug = models.SlugField('Текст ссылки группы', unique=True)
@@ -17,18 +51,81 @@ class Group(models.Model):
         verbose_name_plural = 'Производители'
 
 
-class Post(models.Model):
+class RenderedText(models.Model):
+    """Поле text с готовым HTML и выдержкой (posts.rendering)."""
+
+    text_html = models.TextField('HTML текста', editable=False, default='')
+    excerpt = models.TextField('Выдержка', editable=False, default='')
+
+    class Meta:
+        abstract = True
+
+    def render_text(self):
+        self.text_html = rendering.text_html(self.text)
+        self.excerpt = rendering.excerpt(self.text)
+
+    def save(self, *args, update_fields=None, **kwargs):
+        if update_fields is None or 'text' in update_fields:
+            self.render_text()
+            if update_fields is not None:
+                update_fields = {*update_fields, 'text_html', 'excerpt'}
+        super().save(*args, update_fields=update_fields, **kwargs)
+
+    def __str__(self):
+        return self.text[:15]
+
+
+class PostQuerySet(models.QuerySet):
+    _with_thumbnails = False
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._with_thumbnails = self._with_thumbnails
+        return clone
+
+    def _fetch_all(self):
+        loaded = self._result_cache is not None
+        super()._fetch_all()
+        if (self._with_thumbnails and not loaded
+                and self._iterable_class is ModelIterable):
+            thumbnails.attach(self._result_cache)
+
+    def for_feed(self):
+        """Проекция для ленты: автор, группа, комментарии и миниатюры.
+
+        Исходный текст не читается: страницы выводят text_html и excerpt.
+        """
+        return self.select_related('author', 'group').defer('text').annotate(
+            comment_count=count_of(Comment.objects.all(), 'post'),
+        ).with_thumbnails()
+
+    def with_thumbnails(self):
+        """Готовые миниатюры одной пачкой при загрузке (post.thumbnail)."""
+        clone = self._chain()
+        clone._with_thumbnails = True
+        return clone
+
+    def with_author_stats(self):
+        """Число постов автора для шапки страницы поста."""
+        return self.annotate(author_posts_count=stat_of(
+            'posts_count', Post.objects.all(), 'author', prefix='author__'))
+
+
+class Post(RenderedText):
     text = models.TextField('Текст поста', blank=False,
                             help_text='Введите текст поста')
     pub_date = models.DateTimeField(
         'Дата публикации',
         auto_now_add=True,
         db_index=True)
+    # Входит в ключ кэша карточки поста (posts.cards).
+    updated = models.DateTimeField('Дата изменения', auto_now=True)
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='posts',
-        verbose_name='Производитель')
+        verbose_name='Производитель',
+        db_index=False)
 
     group = models.ForeignKey(
         Group,
@@ -37,29 +134,43 @@ class Post(models.Model):
         null=True,
         related_name='posts',
         verbose_name='Производитель',
-        help_text='Выберите производителя')
+        help_text='Выберите производителя',
+        db_index=False)
 
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=post_images,
         blank=True
     )
 
+    objects = PostQuerySet.as_manager()
+
     class Meta:
         ordering = ('-pub_date', )
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
-
-    def __str__(self):
-        return self.text[:15]
+        # Страницы автора и группы - чтение диапазона индекса в порядке
+        # пагинации (pub_date, pk); они же заменяют индексы внешних ключей.
+        indexes = [
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx',
+            ),
+        ]
 
 
-class Comment(models.Model):
+class Comment(RenderedText):
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
         related_name='comments',
         verbose_name='Пост',
+        db_index=False,
     )
     author = models.ForeignKey(
         User,
@@ -80,9 +191,12 @@ class Comment(models.Model):
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
         ordering = ('-created',)
-
-    def __str__(self):
-        return self.text[:15]
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_created_idx',
+            ),
+        ]
 
 
 class Follow(models.Model):
@@ -96,7 +210,8 @@ class Follow(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='following',
-        verbose_name='На что подписан'
+        verbose_name='На что подписан',
+        db_index=False,
     )
 
     class Meta:
@@ -108,3 +223,79 @@ class Follow(models.Model):
                 name='Уникальный подписчик',
             ),
         ]
+        # Подписчики автора (раскладка ленты) читаются только из индекса.
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx',
+            ),
+        ]
+
+
+class FeedEntry(models.Model):
+    """Материализованная запись ленты подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Подписчик',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Пост',
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        ordering = ('-pub_date',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='Уникальная запись ленты',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='feed_user_pub_date_idx',
+            ),
+        ]
+
+
+class AuthorStats(models.Model):
+    """Денормализованные счетчики пользователя для горячих страниц."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+    comments_count = models.PositiveIntegerField('Комментариев', default=0)
+
+    class Meta:
+        verbose_name = 'Статистика автора'
+        verbose_name_plural = 'Статистика авторов'
+
+    def __str__(self):
+        return f'Статистика {self.user_id}'
+
+
+class StoredImage(models.Model):
+    """Файл картинки в контентно-адресуемом хранилище и число ссылок."""
+    name = models.CharField('Имя файла', max_length=255, primary_key=True)
+    refs = models.PositiveIntegerField('Ссылок', default=0)
+
+    class Meta:
+        verbose_name = 'Файл картинки'
+        verbose_name_plural = 'Файлы картинок'
+
+    def __str__(self):
+        return self.name
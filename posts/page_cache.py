@@ -0,0 +1,167 @@
+"""Кэш целых страниц для анонимных читателей.
+
+Ключ страницы включает поколение ее пути, поэтому сброс пути одним
+инкрементом убирает все его варианты (?page=, ?after=, ?before=).
+Ключ страницы поста включает еще и поколение автора (на ней число его
+постов), поэтому новый пост сбрасывает страницы всех постов автора.
+Сигналы сбрасывают только пути, где изменившийся контент виден; редкие
+изменения, задевающие карточки повсюду (переименование группы или
+автора), сбрасывают все страницы разом.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from . import generations
+
+VARY_HEADERS = ('HTTP_HOST', 'HTTP_ACCEPT_LANGUAGE')
+ALL_PAGES = 'pages'
+
+
+def path_scope(path):
+    return generations.scope(
+        'path', hashlib.md5(path.encode()).hexdigest())
+
+
+def post_author_key(post_id):
+    return f'post-author:{post_id}'
+
+
+def remember_post_author(post_id, author_id):
+    # Автор поста не меняется, поэтому запись бессрочная.
+    cache.set(post_author_key(post_id), author_id, None)
+
+
+def post_author_scopes(post_id):
+    """Области страницы поста сверх пути или None, если автор неизвестен.
+
+    Автора запоминают создание поста и рендеринг его страницы, поэтому
+    проверка кэша страниц не читает базу: страница с неизвестным автором
+    рендерится и кэшируется под ключом, построенным после view.
+    """
+    author_id = cache.get(post_author_key(post_id))
+    if author_id is None:
+        return None
+    return [generations.scope('author', author_id)]
+
+
+# Области страниц по имени view: функция получает аргументы из URL и
+# возвращает None, если областей сейчас не узнать.
+VIEW_SCOPES = {
+    'posts:post_detail': post_author_scopes,
+}
+
+
+def page_key(request, scopes=()):
+    version = generations.versions(
+        ALL_PAGES, path_scope(request.path), *scopes)
+    parts = [request.path, request.META.get('QUERY_STRING', '')] + [
+        request.META.get(header, '') for header in VARY_HEADERS]
+    digest = hashlib.md5('\n'.join(parts).encode()).hexdigest()
+    return f'page:{version}:{digest}'
+
+
+def purge(*paths):
+    generations.bump(*(path_scope(path) for path in paths))
+
+
+def purge_all():
+    generations.bump(ALL_PAGES)
+
+
+def index_path():
+    return reverse('posts:index')
+
+
+def profile_path(username):
+    return reverse('posts:profile', args=(username,))
+
+
+def group_path(slug):
+    return reverse('posts:group_list', args=(slug,))
+
+
+def post_path(post_id):
+    return reverse('posts:post_detail', args=(post_id,))
+
+
+def comments_path(post_id):
+    return reverse('posts:post_comments', args=(post_id,))
+
+
+def purge_post(post_id, username, group_slugs):
+    """Сбрасывает страницы, на которых видна карточка поста."""
+    purge(
+        index_path(),
+        profile_path(username),
+        post_path(post_id),
+        comments_path(post_id),
+        *(group_path(slug) for slug in group_slugs if slug),
+    )
+
+
+class AnonymousPageCacheMiddleware:
+    """Отдает анонимным читателям страницы из кэша до вызова view.
+
+    Анонимным считается запрос без сессионной куки: так проверка не
+    читает сессию из базы. Ответы, использовавшие CSRF-токен, ставящие
+    куки или помеченные как private, не кэшируются.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        key = getattr(request, '_page_cache_key', None)
+        later = getattr(request, '_page_cache_scopes', None)
+        if key is None and later is not None:
+            # Области стали известны после view (она запомнила автора).
+            scopes = later()
+            if scopes is not None:
+                key = page_key(request, scopes)
+        if key is not None and self.is_cacheable(request, response):
+            cache.set(key, response, settings.PAGE_CACHE_TIMEOUT)
+            response['X-Page-Cache'] = 'miss'
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (request.method != 'GET'
+                or settings.SESSION_COOKIE_NAME in request.COOKIES
+                or request.resolver_match.view_name
+                not in settings.PAGE_CACHE_VIEWS):
+            return None
+        view_scopes = VIEW_SCOPES.get(request.resolver_match.view_name)
+        scopes = (
+            view_scopes(**view_kwargs) if view_scopes is not None else [])
+        if scopes is None:
+            request._page_cache_scopes = lambda: view_scopes(**view_kwargs)
+            return None
+        key = page_key(request, scopes)
+        response = cache.get(key)
+        if response is not None:
+            # Валидаторы сохранены в ответе: повтор с ними получает 304.
+            response = get_conditional_response(
+                request,
+                etag=response.get('ETag'),
+                last_modified=parse_http_date_safe(
+                    response.get('Last-Modified', '')),
+                response=response)
+            response['X-Page-Cache'] = 'hit'
+            return response
+        request._page_cache_key = key
+        return None
+
+    def is_cacheable(self, request, response):
+        return (
+            response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and not request.META.get('CSRF_COOKIE_USED')
+            and 'private' not in response.get('Cache-Control', '')
+            and 'no-store' not in response.get('Cache-Control', '')
+        )
@@ -0,0 +1,345 @@
+import base64
+import binascii
+import hashlib
+
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.db import connections, router
+from django.db.models import Max, Q, QuerySet
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from . import search
+from .models import Post
+
+
+def encode_position(value, pk):
+    position = f'{value}|{pk}'
+    return base64.urlsafe_b64encode(position.encode()).decode().rstrip('=')
+
+
+def decode_position(cursor):
+    """Пара (значение строкой, pk) из курсора или None, если он битый."""
+    if not cursor:
+        return None
+    try:
+        position = base64.urlsafe_b64decode(
+            cursor + '=' * (-len(cursor) % 4)).decode()
+        value, pk = position.rsplit('|', 1)
+        return value, int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+class CursorPage:
+    """Страница ленты, выбранная по курсору, а не по номеру.
+
+    Строки читаются при первом обращении, поэтому страница, целиком
+    отданная из кэша фрагментов, не делает запросов к базе.
+    """
+
+    is_cursor = True
+
+    def __init__(self, load):
+        self._load = load
+        self._result = None
+
+    def _fetch(self):
+        if self._result is None:
+            self._result = self._load()
+        return self._result
+
+    @property
+    def object_list(self):
+        return self._fetch()[0]
+
+    @property
+    def next_cursor(self):
+        return self._fetch()[1]
+
+    @property
+    def previous_cursor(self):
+        return self._fetch()[2]
+
+    def __repr__(self):
+        return f'<Cursor page of {len(self.object_list)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Keyset-пагинация по индексу (field, tiebreak) без COUNT(*) и OFFSET.
+
+    Курсор - непрозрачный токен с позицией крайнего объекта страницы:
+    ?after= ведет к более старым записям, ?before= - к более новым.
+    """
+
+    def __init__(self, object_list, per_page, field='pub_date',
+                 tiebreak='pk'):
+        self.object_list = object_list
+        self.per_page = per_page
+        self.field = field
+        self.tiebreak = tiebreak
+
+    def encode_cursor(self, obj):
+        return encode_position(
+            getattr(obj, self.field).isoformat(), getattr(obj, self.tiebreak))
+
+    def decode_cursor(self, cursor):
+        position = decode_position(cursor)
+        if position is None:
+            return None
+        value, pk = position
+        try:
+            value = parse_datetime(value)
+        except ValueError:
+            return None
+        if value is None:
+            return None
+        return value, pk
+
+    def get_page(self, after=None, before=None):
+        """Возвращает страницу; битый курсор ведет на первую страницу."""
+        return CursorPage(lambda: self._rows(after, before))
+
+    def _rows(self, after, before):
+        queryset = self.object_list.order_by(
+            f'-{self.field}', f'-{self.tiebreak}')
+        position = self.decode_cursor(before)
+        if position is not None:
+            value, pk = position
+            rows = list(queryset.filter(
+                Q(**{f'{self.field}__gt': value})
+                | Q(**{self.field: value, f'{self.tiebreak}__gt': pk})
+            ).reverse()[:self.per_page + 1])
+            if rows:
+                has_previous = len(rows) > self.per_page
+                return self._page(
+                    rows[:self.per_page][::-1], True, has_previous)
+        position = self.decode_cursor(after)
+        if position is not None:
+            value, pk = position
+            rows = list(queryset.filter(
+                Q(**{f'{self.field}__lt': value})
+                | Q(**{self.field: value, f'{self.tiebreak}__lt': pk})
+            )[:self.per_page + 1])
+            return self._page(
+                rows[:self.per_page], len(rows) > self.per_page, True)
+        rows = list(queryset[:self.per_page + 1])
+        return self._page(
+            rows[:self.per_page], len(rows) > self.per_page, False)
+
+    def _page(self, rows, has_next, has_previous):
+        return (
+            rows,
+            self.encode_cursor(rows[-1]) if has_next and rows else None,
+            self.encode_cursor(rows[0]) if has_previous and rows else None,
+        )
+
+
+class SearchPaginator:
+    """Keyset-пагинация результатов поиска по (релевантность, id)."""
+
+    def __init__(self, query, per_page, queryset=None):
+        self.query = query
+        self.per_page = per_page
+        self.queryset = (
+            Post.objects.for_feed() if queryset is None else queryset)
+
+    def decode_cursor(self, cursor):
+        position = decode_position(cursor)
+        if position is None:
+            return None
+        score, pk = position
+        try:
+            return float(score), pk
+        except ValueError:
+            return None
+
+    def get_page(self, after=None, before=None):
+        """Возвращает страницу; битый курсор ведет на первую страницу."""
+        return CursorPage(lambda: self._rows(after, before))
+
+    def _rows(self, after, before):
+        position = self.decode_cursor(before)
+        if position is not None:
+            rows = search.ranked(
+                self.query, before=position, limit=self.per_page + 1)
+            if rows:
+                return self._page(
+                    rows[:self.per_page][::-1], True,
+                    len(rows) > self.per_page)
+        position = self.decode_cursor(after)
+        rows = search.ranked(
+            self.query, after=position, limit=self.per_page + 1)
+        return self._page(
+            rows[:self.per_page], len(rows) > self.per_page,
+            position is not None)
+
+    def _page(self, rows, has_next, has_previous):
+        posts = self.queryset.in_bulk([pk for pk, score in rows])
+        return (
+            [posts[pk] for pk, score in rows if pk in posts],
+            encode_position(*rows[-1][::-1]) if has_next and rows else None,
+            encode_position(*rows[0][::-1]) if has_previous and rows else None,
+        )
+
+
+def estimated_rows(model):
+    """Приблизительное число строк таблицы модели без COUNT(*).
+
+    Берется из sqlite_stat1 (заполняется командой ANALYZE), а если
+    статистики нет - по max(pk), который читается из индекса.
+    """
+    connection = connections[router.db_for_read(model)]
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+            if cursor.fetchone():
+                cursor.execute(
+                    'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1',
+                    [model._meta.db_table])
+                row = cursor.fetchone()
+                if row:
+                    return int(row[0].split()[0])
+    return model._default_manager.order_by().aggregate(
+        last=Max('pk'))['last'] or 0
+
+
+def countable(queryset):
+    """queryset для COUNT(*): те же строки без сортировки и аннотаций.
+
+    С аннотациями Django считает строки через подзапрос, вычисляя их
+    (например, число комментариев) для каждой строки. Условия по
+    аннотациям уже развернуты в WHERE, поэтому снимаются только
+    аннотации без агрегатов.
+    """
+    queryset = queryset.order_by()
+    query = queryset.query
+    if not any(annotation.contains_aggregate
+               for annotation in query.annotations.values()):
+        query.annotations.clear()
+        query.set_annotation_mask(None)
+    return queryset
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator, который не считает точно строки больших таблиц.
+
+    Для запроса без условий число строк оценивается по статистике
+    таблицы; точный COUNT(*) делается, только если оценка меньше
+    count_limit. Для запроса с условиями считается не больше count_limit
+    строк, дальше страниц просто не показывается.
+    """
+
+    count_limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet):
+            return super().count
+        if queryset.query.where:
+            return self.filtered_count(queryset)
+        estimate = estimated_rows(queryset.model)
+        if estimate < self.count_limit:
+            return countable(queryset).count()
+        return estimate
+
+    def filtered_count(self, queryset):
+        return countable(queryset)[:self.count_limit].count()
+
+    @property
+    def exact_count(self):
+        """Точное число строк, если оно действительно нужно."""
+        return countable(self.object_list).count()
+
+
+class ElidedPage(Page):
+    @cached_property
+    def elided_page_range(self):
+        return list(self.paginator.get_elided_page_range(self.number))
+
+
+class CachedCountPaginator(EstimatedCountPaginator):
+    """Paginator ленты по номерам страниц без COUNT(*) на каждый запрос.
+
+    Число строк берется из known_count (например, из счетчика автора),
+    иначе из кэша под ключом с поколением области (version), так что
+    после изменения ленты оно пересчитывается один раз. Для больших
+    таблиц без условий кэшируется оценка по статистике. Страницы
+    перечисляются окном вокруг текущей с многоточиями.
+    """
+
+    ELLIPSIS = '…'
+
+    def __init__(self, object_list, per_page, version='', known_count=None,
+                 timeout=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.version = version
+        self.known_count = known_count
+        self.timeout = timeout
+
+    def count_key(self):
+        sql = str(self.object_list.query).encode()
+        return f'count:{self.version}:{hashlib.md5(sql).hexdigest()}'
+
+    @cached_property
+    def count(self):
+        if self.known_count is not None:
+            return self.known_count
+        key = self.count_key()
+        count = cache.get(key)
+        if count is None:
+            count = super().count
+            cache.set(key, count, self.timeout)
+        return count
+
+    def filtered_count(self, queryset):
+        return countable(queryset).count()
+
+    def get_page(self, number):
+        page = super().get_page(number)
+        if not page.object_list and page.number > 1:
+            # Оценка оказалась больше, чем строк на самом деле.
+            self.count = self.exact_count
+            self.__dict__.pop('num_pages', None)
+            cache.set(self.count_key(), self.count, self.timeout)
+            page = super().get_page(number)
+        return page
+
+    def _get_page(self, *args, **kwargs):
+        return ElidedPage(*args, **kwargs)
+
+    def get_elided_page_range(self, number=1, on_each_side=3, on_ends=2):
+        """Номера страниц: края, окно вокруг number и ELLIPSIS между ними."""
+        number = self.validate_number(number)
+        if self.num_pages <= (on_each_side + on_ends) * 2:
+            yield from self.page_range
+            return
+        if number > 1 + on_each_side + on_ends + 1:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < self.num_pages - on_each_side - on_ends - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(self.num_pages - on_ends + 1, self.num_pages + 1)
+        else:
+            yield from range(number + 1, self.num_pages + 1)
@@ -0,0 +1,40 @@
+"""Готовый к выводу текст постов и комментариев.
+
+Текст меняется только при сохранении, поэтому HTML с переносами строк
+(как фильтр linebreaksbr) и выдержка для заголовка (truncatewords) тоже
+считаются при сохранении и хранятся рядом с текстом, а шаблоны выводят
+готовые поля. Строки, вставленные в обход save() (импорт, миграции),
+заполняет команда rebuild_text.
+"""
+from django.template.defaultfilters import linebreaksbr, truncatewords
+
+EXCERPT_WORDS = 30
+BATCH_SIZE = 500
+
+
+def text_html(text):
+    return linebreaksbr(text, autoescape=True)
+
+
+def excerpt(text):
+    return truncatewords(text, EXCERPT_WORDS)
+
+
+def rebuild(model, batch_size=BATCH_SIZE):
+    """Пересчитывает text_html и excerpt всех строк модели пачками.
+
+    Возвращает число строк.
+    """
+    count = 0
+    last_pk = 0
+    while True:
+        batch = list(model.objects.filter(pk__gt=last_pk).order_by(
+            'pk').only('pk', 'text')[:batch_size])
+        if not batch:
+            return count
+        for obj in batch:
+            obj.text_html = text_html(obj.text)
+            obj.excerpt = excerpt(obj.text)
+        model.objects.bulk_update(batch, ['text_html', 'excerpt'])
+        count += len(batch)
+        last_pk = batch[-1].pk
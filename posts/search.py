@@ -0,0 +1,190 @@
+"""Полнотекстовый поиск по постам и комментариям на SQLite FTS5.
+
+В виртуальной таблице posts_search одна строка на пост (rowid = id
+поста): основы слов текста поста и основы слов всех его комментариев в
+отдельных колонках. В posts_comment_search одна строка на комментарий
+(rowid = id комментария) - для поиска самих комментариев. Стемминг
+делается в Python, поэтому таблицы обновляют сигналы, а не триггеры:
+новый, измененный или удаленный комментарий меняет только свой вклад,
+не перечитывая остальные комментарии поста. Результаты ранжируются по
+bm25, где совпадение в тексте поста весит больше, чем в комментариях.
+"""
+import re
+from collections import Counter
+from functools import lru_cache
+
+from django.db import connection, connections, router
+
+from .models import Comment, Post
+from .stemmer import stem as stem_word
+
+TABLE = 'posts_search'
+COMMENTS_TABLE = 'posts_comment_search'
+WORD = re.compile(r'\w+')
+# Веса колонок text и comments для bm25 (меньше - релевантнее).
+RANK = f'bm25({TABLE}, 10.0, 1.0)'
+BATCH_SIZE = 500
+# Словарь текстов невелик по сравнению с числом слов в них.
+stem = lru_cache(maxsize=100000)(stem_word)
+
+
+def terms(text):
+    """Основы слов текста через пробел, в виде для индекса."""
+    return ' '.join(stem(word) for word in WORD.findall(text.lower()))
+
+
+def match_query(query):
+    """Выражение MATCH: все слова запроса как префиксы основ.
+
+    Каждое слово берется в кавычки, поэтому операторы FTS5 из
+    пользовательского ввода не интерпретируются.
+    """
+    words = terms(query).split()
+    return ' '.join('"{}"*'.format(word.replace('"', '""')) for word in words)
+
+
+def index(post_ids):
+    """Переиндексирует посты; удаленные посты убираются из индекса."""
+    post_ids = list(post_ids)
+    texts = dict(Post.objects.filter(pk__in=post_ids).values_list(
+        'pk', 'text'))
+    comments = {}
+    # Порядок индекса комментариев поста: без сортировки всей выборки.
+    for post_id, text in Comment.objects.filter(post__in=texts).order_by(
+            'post', '-created').values_list('post', 'text'):
+        comments.setdefault(post_id, []).append(text)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {TABLE} WHERE rowid = %s',
+            [(post_id,) for post_id in post_ids])
+        cursor.executemany(
+            f'INSERT INTO {TABLE} (rowid, text, comments) '
+            f'VALUES (%s, %s, %s)',
+            [
+                (post_id, terms(text),
+                 terms(' '.join(comments.get(post_id, ()))))
+                for post_id, text in texts.items()
+            ])
+
+
+def without(words, removed):
+    """Слова без одного вхождения каждого из removed."""
+    extra = Counter(removed)
+    kept = []
+    for word in words:
+        if extra[word]:
+            extra[word] -= 1
+        else:
+            kept.append(word)
+    return kept
+
+
+def index_comment(post_id, comment_id, old=None, new=None):
+    """Меняет в индексе вклад одного комментария.
+
+    old - прежний текст (None для нового комментария), new - текущий
+    (None для удаленного).
+    """
+    added = terms(new or '')
+    with connection.cursor() as cursor:
+        if old is not None:
+            cursor.execute(
+                f'DELETE FROM {COMMENTS_TABLE} WHERE rowid = %s',
+                [comment_id])
+        if new is not None:
+            cursor.execute(
+                f'INSERT INTO {COMMENTS_TABLE} (rowid, text) '
+                f'VALUES (%s, %s)', [comment_id, added])
+        removed = terms(old or '').split()
+        if not removed:
+            # Новый комментарий дописывается без чтения строки поста.
+            if added:
+                cursor.execute(
+                    f"UPDATE {TABLE} SET comments = trim("
+                    f"%s || ' ' || comments) WHERE rowid = %s",
+                    [added, post_id])
+            return
+        cursor.execute(
+            f'SELECT comments FROM {TABLE} WHERE rowid = %s', [post_id])
+        row = cursor.fetchone()
+        if row is None:
+            return
+        words = without(row[0].split(), removed)
+        cursor.execute(
+            f'UPDATE {TABLE} SET comments = %s WHERE rowid = %s',
+            [' '.join(added.split() + words), post_id])
+
+
+def rebuild(batch_size=BATCH_SIZE):
+    """Перестраивает индекс целиком; возвращает число постов."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        cursor.execute(f'DELETE FROM {COMMENTS_TABLE}')
+    last_pk = 0
+    while True:
+        batch = list(Comment.objects.filter(pk__gt=last_pk).order_by(
+            'pk').values_list('pk', 'text')[:batch_size])
+        if not batch:
+            break
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {COMMENTS_TABLE} (rowid, text) '
+                f'VALUES (%s, %s)',
+                [(pk, terms(text)) for pk, text in batch])
+        last_pk = batch[-1][0]
+    count = 0
+    last_pk = 0
+    while True:
+        batch = list(Post.objects.filter(pk__gt=last_pk).order_by(
+            'pk').values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return count
+        index(batch)
+        count += len(batch)
+        last_pk = batch[-1]
+
+
+def ranked(query, after=None, before=None, limit=10):
+    """(id поста, релевантность) в порядке релевантности.
+
+    after/before - позиция (релевантность, id) крайнего результата
+    соседней страницы для keyset-пагинации; с before строки идут в
+    обратном порядке, от ближайших к позиции.
+    """
+    match = match_query(query)
+    if not match:
+        return []
+    sql = f'SELECT rowid, {RANK} FROM {TABLE} WHERE {TABLE} MATCH %s'
+    params = [match]
+    order = 'ASC'
+    if before is not None:
+        sql += f' AND ({RANK}, rowid) < (%s, %s)'
+        params += before
+        order = 'DESC'
+    elif after is not None:
+        sql += f' AND ({RANK}, rowid) > (%s, %s)'
+        params += after
+    sql += f' ORDER BY {RANK} {order}, rowid {order} LIMIT %s'
+    with connections[router.db_for_read(Post)].cursor() as cursor:
+        cursor.execute(sql, params + [limit])
+        return cursor.fetchall()
+
+
+def filter_matching(queryset, query, column=None, field='id', table=TABLE):
+    """Оставляет в queryset только строки, найденные в индексе table.
+
+    field - колонка таблицы queryset с rowid индекса (id поста или
+    комментария), column - колонка индекса, если искать только в ней;
+    без ранжирования.
+    Не через pk__in=RawSQL(...): Django оборачивает подзапрос во вторые
+    скобки, и SQLite считает его скаляром, возвращая одну строку.
+    """
+    match = match_query(query)
+    if column is not None:
+        match = f'{column} : ({match})'
+    return queryset.extra(
+        where=[
+            f'{queryset.model._meta.db_table}.{field} IN '
+            f'(SELECT rowid FROM {table} WHERE {table} MATCH %s)'],
+        params=[match],
+    )
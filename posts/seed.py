@@ -0,0 +1,170 @@
+"""Синтетические данные для замеров на реалистичных объемах.
+
+Строки генерируются в формате файлов transfer и вставляются теми же
+пачками, поэтому миллион постов не держится в памяти целиком. Авторы
+постов, комментариев и подписок выбираются по степенному закону (вес
+автора номер i пропорционален 1 / i ** alpha): несколько популярных
+авторов и длинный хвост, как в настоящих соцсетях. Число подписок
+пользователя тоже распределено по Парето.
+"""
+import io
+import random
+from bisect import bisect
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.db.models import Max
+from django.utils import timezone
+from PIL import Image
+
+from . import storage, transfer
+from .models import Post
+
+PASSWORD = 'seed-password'
+WORDS = (
+    'телефон', 'чехол', 'экран', 'камера', 'батарея', 'зарядка', 'корпус',
+    'кожаный', 'новый', 'быстрый', 'красивый', 'дешевый', 'отличный',
+    'продаю', 'куплю', 'обмен', 'доставка', 'гарантия', 'модель', 'цвет',
+    'черный', 'белый', 'память', 'процессор', 'наушники', 'стекло',
+)
+IMAGE_COUNT = 20
+# Параметр Парето для числа подписок: среднее значение a / (a - 1).
+FOLLOW_SHAPE = 1.5
+
+
+class Weighted:
+    """Выбор номера от 0 до size - 1 с весами 1 / (номер + 1) ** alpha."""
+
+    def __init__(self, size, alpha, rng):
+        self.cum_weights = list(accumulate(
+            1 / (rank + 1) ** alpha for rank in range(size)))
+        self.rng = rng
+
+    def __call__(self):
+        return bisect(
+            self.cum_weights, self.rng.random() * self.cum_weights[-1])
+
+
+def sentence(rng, low=5, high=30):
+    return ' '.join(rng.choices(WORDS, k=rng.randint(low, high))).capitalize()
+
+
+def username(number):
+    return f'user{number:06d}'
+
+
+def images(rng, count=IMAGE_COUNT):
+    """Сохраняет count разных картинок; возвращает их имена."""
+    names = []
+    for _ in range(count):
+        image = Image.new('RGB', (1200, 800), tuple(
+            rng.randrange(256) for _ in range(3)))
+        image.paste(
+            tuple(rng.randrange(256) for _ in range(3)),
+            (rng.randrange(600), rng.randrange(400), 1200, 800))
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=85)
+        names.append(storage.post_images.save(
+            'posts/seed.jpg', ContentFile(buffer.getvalue())))
+    return names
+
+
+def user_rows(count, rng):
+    password = make_password(PASSWORD)
+    now = timezone.now()
+    for number in range(count):
+        yield {
+            'username': username(number),
+            'email': f'{username(number)}@example.com',
+            'first_name': '',
+            'last_name': '',
+            'password': password,
+            'is_active': True,
+            'is_staff': False,
+            'is_superuser': False,
+            'date_joined': (now - timedelta(
+                days=rng.randint(0, 1000))).isoformat(),
+        }
+
+
+def group_rows(count, rng):
+    for number in range(count):
+        yield {
+            'slug': f'group-{number}',
+            'title': f'Производитель {number}',
+            'description': sentence(rng),
+        }
+
+
+def post_rows(count, first_id, authors, groups, image_names, image_share,
+              days, rng):
+    now = timezone.now()
+    span = timedelta(days=days)
+    for number in range(count):
+        yield {
+            'id': first_id + number,
+            'author': username(authors()),
+            'group': (
+                f'group-{rng.randrange(groups)}'
+                if groups and rng.random() < 0.7 else None),
+            'text': sentence(rng),
+            'pub_date': (now - span + span * number / count).isoformat(),
+            'image': (
+                rng.choice(image_names)
+                if image_names and rng.random() < image_share else ''),
+        }
+
+
+def comment_rows(count, first_post, posts, users, popular, rng):
+    now = timezone.now()
+    for _ in range(count):
+        # Популярные посты - свежие: номер считается от последнего.
+        post = first_post + posts - 1 - popular()
+        yield {
+            'id': None,
+            'post': post,
+            'author': username(rng.randrange(users)),
+            'text': sentence(rng, 2, 15),
+            'created': (now - timedelta(
+                minutes=rng.randint(0, 60 * 24 * 30))).isoformat(),
+        }
+
+
+def follow_rows(users, mean, authors, rng):
+    scale = mean * (FOLLOW_SHAPE - 1) / FOLLOW_SHAPE
+    for user in range(users):
+        count = min(users - 1, int(rng.paretovariate(FOLLOW_SHAPE) * scale))
+        for author in {authors() for _ in range(count)} - {user}:
+            yield {'user': username(user), 'author': username(author)}
+
+
+def seed(users=1000, groups=20, posts=10000, comments=20000, follows=20,
+         image_share=0.2, alpha=1.1, days=365, random_seed=0):
+    """Создает набор данных; возвращает {таблица: число строк}.
+
+    Уже существующие пользователи и группы с теми же именами
+    переиспользуются, посты и комментарии добавляются к имеющимся.
+    """
+    rng = random.Random(random_seed)
+    first_id = (Post.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+    authors = Weighted(users, alpha, rng)
+    popular_posts = Weighted(posts, alpha, rng) if posts else None
+    tables = (
+        ('users', lambda: user_rows(users, rng)),
+        ('groups', lambda: group_rows(groups, rng)),
+        ('posts', lambda: post_rows(
+            posts, first_id, authors, groups,
+            images(rng) if image_share else [], image_share, days, rng)),
+        ('comments', lambda: comment_rows(
+            comments if posts else 0, first_id, posts, users,
+            popular_posts, rng)),
+        ('follows', lambda: follow_rows(users, follows, authors, rng)),
+    )
+    created = {}
+    for name, rows in tables:
+        created[name] = sum(
+            count - missing
+            for count, missing in transfer.save(transfer.table(name), rows()))
+    return created
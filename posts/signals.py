@@ -0,0 +1,217 @@
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import (feeds, generations, page_cache, search, stats, storage,
+               thumbnails)
+from .models import AuthorStats, Comment, Follow, Group, Post, User
+
+COUNTERS = {
+    Post: 'posts_count',
+    Comment: 'comments_count',
+}
+
+
+@receiver(post_save, sender=User)
+def create_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        AuthorStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Comment)
+def count_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        stats.bump(instance.author_id, COUNTERS[sender], 1)
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Comment)
+def count_deleted(sender, instance, **kwargs):
+    stats.bump(instance.author_id, COUNTERS[sender], -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        stats.bump(instance.author_id, 'followers_count', 1)
+        stats.bump(instance.user_id, 'following_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_unfollow(sender, instance, **kwargs):
+    stats.bump(instance.author_id, 'followers_count', -1)
+    stats.bump(instance.user_id, 'following_count', -1)
+    feeds.unfollowed(instance.author_id)
+
+
+# Подключен после счетчиков: раскладка смотрит на followers_count.
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        feeds.fan_out(instance)
+
+
+@receiver(post_save, sender=Post)
+def generate_thumbnails(sender, instance, raw=False, **kwargs):
+    if instance.image and not raw:
+        thumbnails.schedule(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_feed(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        feeds.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_feed(sender, instance, **kwargs):
+    feeds.prune(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def index_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index([instance.pk])
+
+
+@receiver(pre_save, sender=Comment)
+def remember_old_text(sender, instance, raw=False, **kwargs):
+    instance._old_text = None
+    if instance.pk and not raw:
+        instance._old_text = Comment.objects.filter(
+            pk=instance.pk).values_list('text', flat=True).first()
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_comment(
+            instance.post_id, instance.pk,
+            getattr(instance, '_old_text', None), instance.text)
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_comment(sender, instance, **kwargs):
+    search.index_comment(instance.post_id, instance.pk, instance.text)
+
+
+@receiver(pre_save, sender=Post)
+def remember_old(sender, instance, raw=False, **kwargs):
+    instance._old_group_id = instance._old_image = None
+    if instance.pk and not raw:
+        old = Post.objects.filter(pk=instance.pk).values_list(
+            'group', 'image').first()
+        if old is not None:
+            instance._old_group_id, instance._old_image = old
+
+
+@receiver(post_save, sender=Post)
+def reference_image(sender, instance, raw=False, **kwargs):
+    old_image = getattr(instance, '_old_image', None) or ''
+    new_image = instance.image.name or ''
+    if old_image == new_image or raw:
+        return
+    if new_image:
+        storage.acquire(new_image)
+    if old_image:
+        storage.release(old_image)
+
+
+@receiver(post_delete, sender=Post)
+def release_image(sender, instance, **kwargs):
+    if instance.image:
+        storage.release(instance.image.name)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post(sender, instance, created=False, **kwargs):
+    if created:
+        page_cache.remember_post_author(instance.pk, instance.author_id)
+    scopes = generations.post_scopes(
+        instance.author_id, instance.group_id, instance.pk)
+    group_ids = {instance.group_id}
+    old_group_id = getattr(instance, '_old_group_id', None)
+    if old_group_id is not None:
+        scopes.append(generations.scope('group', old_group_id))
+        group_ids.add(old_group_id)
+    generations.bump(*scopes)
+    if not created:
+        # Новый пост сдвигает ленты при раскладке.
+        feeds.touch(instance.author_id)
+    page_cache.purge_post(
+        instance.pk,
+        instance.author.username,
+        Group.objects.filter(pk__in=group_ids).values_list('slug', flat=True),
+    )
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment(sender, instance, **kwargs):
+    post = Post.objects.filter(pk=instance.post_id).values(
+        'author', 'group', 'author__username', 'group__slug').first()
+    if post is not None:
+        generations.bump(
+            generations.scope('comments', instance.post_id),
+            *generations.post_scopes(
+                post['author'], post['group'], instance.post_id))
+        feeds.touch(post['author'])
+        page_cache.purge_post(
+            instance.post_id, post['author__username'], [post['group__slug']])
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow(sender, instance, **kwargs):
+    generations.bump(generations.scope('feed', instance.user_id))
+    page_cache.purge(page_cache.profile_path(instance.author.username))
+
+
+def _bump_authors(posts):
+    generations.bump(*(
+        generations.scope('author', author_id)
+        for author_id in posts.values_list(
+            'author', flat=True).order_by().distinct()))
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def invalidate_group(sender, instance, **kwargs):
+    generations.bump(
+        generations.GLOBAL, generations.FEEDS,
+        generations.scope('group', instance.pk))
+    _bump_authors(instance.posts.all())
+    page_cache.purge_all()
+
+
+@receiver(pre_save, sender=User)
+def remember_old_username(sender, instance, update_fields=None, raw=False,
+                          **kwargs):
+    instance._old_username = None
+    if (instance.pk and not raw
+            and (update_fields is None or 'username' in update_fields)):
+        instance._old_username = User.objects.filter(
+            pk=instance.pk).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def invalidate_author(sender, instance, created, raw=False, **kwargs):
+    # Смена пароля, профиля и вход не меняют видимое имя.
+    old_username = getattr(instance, '_old_username', None)
+    if created or raw or old_username in (None, instance.username):
+        return
+    generations.bump(generations.GLOBAL, generations.FEEDS, *(
+        generations.scope('group', group_id)
+        for group_id in instance.posts.exclude(group=None).values_list(
+            'group', flat=True).order_by().distinct()
+    ), *(
+        # Имя автора комментария - во фрагментах комментариев постов.
+        generations.scope('comments', post_id)
+        for post_id in instance.comments.values_list(
+            'post', flat=True).order_by().distinct()
+    ), generations.scope('author', instance.pk))
+    # Страницы постов и их комментариев в том числе.
+    page_cache.purge_all()
@@ -0,0 +1,82 @@
+"""Денормализованные счетчики пользователей (AuthorStats).
+
+Счетчики меняются одним UPDATE с F()-выражением, поэтому параллельные
+запросы не теряют инкременты. Если строки нет (пользователь создан в
+обход сигналов), UPDATE ничего не делает, а строку создаст сверка
+recount_stats; до тех пор страницы считают значения напрямую. Счетчик
+не опускается ниже нуля, даже если разошелся с данными (посты из
+bulk_create или импорта без пересчета).
+"""
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from .models import AuthorStats, Comment, Follow, Post, User, count_of
+
+FIELDS = {
+    'posts_count': (Post, 'author'),
+    'followers_count': (Follow, 'author'),
+    'following_count': (Follow, 'user'),
+    'comments_count': (Comment, 'author'),
+}
+
+
+def bump(user_id, field, delta):
+    AuthorStats.objects.filter(user=user_id).update(
+        **{field: Greatest(F(field) + delta, 0)})
+
+
+def recount(users, fix=True):
+    """Пересчитывает счетчики пользователей и возвращает расхождения.
+
+    Результат - словарь {user_id: {поле: (было, стало)}}; отсутствующая
+    строка считается расхождением со значениями None.
+    """
+    actual = users.annotate(**{
+        f'actual_{field}': count_of(model.objects.all(), fk)
+        for field, (model, fk) in FIELDS.items()
+    }).values('pk', *(f'actual_{field}' for field in FIELDS))
+    stored = {
+        stats.pk: stats
+        for stats in AuthorStats.objects.filter(user__in=users)
+    }
+    drift = {}
+    missing = []
+    changed = []
+    for row in actual:
+        values = {field: row[f'actual_{field}'] for field in FIELDS}
+        stats = stored.get(row['pk'])
+        if stats is None:
+            missing.append(AuthorStats(user_id=row['pk'], **values))
+            drift[row['pk']] = {
+                field: (None, value) for field, value in values.items()}
+            continue
+        diff = {
+            field: (getattr(stats, field), value)
+            for field, value in values.items()
+            if getattr(stats, field) != value
+        }
+        if diff:
+            drift[row['pk']] = diff
+            changed.append(row['pk'])
+    if fix:
+        AuthorStats.objects.bulk_create(missing, ignore_conflicts=True)
+        # Подсчет и запись одним UPDATE: инкремент bump, пришедший после
+        # сверки, не затирается посчитанным раньше значением.
+        AuthorStats.objects.filter(user__in=changed).update(**{
+            field: count_of(model.objects.all(), fk, outer='user')
+            for field, (model, fk) in FIELDS.items()
+        })
+    return drift
+
+
+def recount_all(batch_size=1000, fix=True):
+    """Сверяет счетчики всех пользователей пачками по batch_size."""
+    last_pk = 0
+    while True:
+        batch = list(User.objects.filter(pk__gt=last_pk).order_by(
+            'pk').values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return
+        last_pk = batch[-1]
+        yield len(batch), recount(
+            User.objects.filter(pk__in=batch), fix=fix)
@@ -0,0 +1,108 @@
+"""Стеммер русского языка по алгоритму Snowball.
+
+FTS5 умеет стемминг только английского (porter), поэтому слова
+приводятся к основе до записи в индекс и в поисковом запросе.
+"""
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND = (
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+REFLEXIVE = ((), ('ся', 'сь'))
+ADJECTIVE = ((), (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+    'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+    'ая', 'яя', 'ою', 'ею',
+))
+PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+VERB = (
+    ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет',
+     'ют', 'ны', 'ть', 'ешь', 'нно'),
+    ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй',
+     'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует', 'уют',
+     'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'),
+)
+NOUN = ((), (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и',
+    'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о',
+    'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия', 'ья', 'я',
+))
+SUPERLATIVE = ((), ('ейше', 'ейш'))
+DERIVATIONAL = ((), ('ост', 'ость'))
+
+
+def regions(word):
+    """Начала областей RV и R2 (см. описание алгоритма Snowball)."""
+    rv = next(
+        (i + 1 for i, char in enumerate(word) if char in VOWELS), len(word))
+
+    def after_consonant(start):
+        for i in range(start + 1, len(word)):
+            if word[i - 1] in VOWELS and word[i] not in VOWELS:
+                return i + 1
+        return len(word)
+
+    return rv, after_consonant(after_consonant(0))
+
+
+def strip(word, start, groups):
+    """Снимает самое длинное окончание из groups внутри word[start:].
+
+    Окончания первой группы снимаются только после "а" или "я". Если
+    окончание не найдено или условие не выполнено, возвращает None.
+    """
+    candidates = [(1, ending) for ending in groups[0]] + [
+        (2, ending) for ending in groups[1]]
+    found = max(
+        (
+            (len(ending), group) for group, ending in candidates
+            if word.endswith(ending) and len(word) - len(ending) >= start
+        ),
+        default=None,
+    )
+    if found is None:
+        return None
+    length, group = found
+    stem = word[:-length]
+    if group == 1 and not (len(stem) > start and stem[-1] in 'ая'):
+        return None
+    return stem
+
+
+def stem(word):
+    """Основа слова; слово должно быть в нижнем регистре."""
+    word = word.replace('ё', 'е')
+    rv, r2 = regions(word)
+    result = strip(word, rv, PERFECTIVE_GERUND)
+    if result is None:
+        word = strip(word, rv, REFLEXIVE) or word
+        adjective = strip(word, rv, ADJECTIVE)
+        if adjective is not None:
+            result = strip(adjective, rv, PARTICIPLE)
+            if result is None:
+                result = adjective
+        else:
+            result = strip(word, rv, VERB)
+            if result is None:
+                result = strip(word, rv, NOUN)
+            if result is None:
+                result = word
+    word = result
+    if word.endswith('и') and len(word) - 1 >= rv:
+        word = word[:-1]
+    word = strip(word, r2, DERIVATIONAL) or word
+    if word.endswith('нн') and len(word) - 2 >= rv:
+        return word[:-1]
+    superlative = strip(word, rv, SUPERLATIVE)
+    if superlative is not None:
+        word = superlative
+        if word.endswith('нн') and len(word) - 2 >= rv:
+            return word[:-1]
+        return word
+    if word.endswith('ь') and len(word) - 1 >= rv:
+        word = word[:-1]
+    return word
@@ -0,0 +1,126 @@
+"""Контентно-адресуемое хранилище картинок постов.
+
+Загрузка хешируется (SHA-256) по мере записи во временный файл и
+сохраняется под именем из хеша, поэтому одинаковые картинки лежат на
+диске один раз, а миниатюры sorl, ключ которых строится из имени
+исходника, тоже создаются один раз. Число ссылок хранится в
+StoredImage: ссылки берут и отпускают сигналы сохранения и удаления
+поста, сравнивая старую и новую картинку поста, поэтому повторная
+загрузка того же файла ссылок не добавляет. Сохранение файла только
+заводит строку счетчика, чтобы recount нашел файл, который так и не
+достался ни одному посту. Когда ссылок не остается, файл и его
+миниатюры удаляются в той же транзакции, что и строка счетчика.
+"""
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import Count, F
+from sorl.thumbnail import delete as delete_with_thumbnails
+from sorl.thumbnail.images import ImageFile
+
+DIGEST_NAME = re.compile(r'(?:^|/)([0-9a-f]{2})/\1[0-9a-f]{62}\.\w+$')
+
+
+def is_addressed(name):
+    """Имя уже построено из хеша содержимого."""
+    return DIGEST_NAME.search(name) is not None
+
+
+def digest_name(name, digest):
+    directory, filename = posixpath.split(name)
+    extension = os.path.splitext(filename)[1].lower()
+    return posixpath.join(directory, digest[:2], digest + extension)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # Имя задает содержимое: одинаковое имя - тот же файл.
+        return name
+
+    def _save(self, name, content):
+        directory = os.path.dirname(self.path(name))
+        os.makedirs(directory, exist_ok=True)
+        digest = hashlib.sha256()
+        descriptor, temporary = tempfile.mkstemp(
+            dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(descriptor, 'wb') as target:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    target.write(chunk)
+            os.chmod(temporary, self.file_permissions_mode or 0o644)
+            name = digest_name(name, digest.hexdigest())
+            with transaction.atomic():
+                register(name)
+                if not self.exists(name):
+                    os.makedirs(
+                        os.path.dirname(self.path(name)), exist_ok=True)
+                    os.replace(temporary, self.path(name))
+                    temporary = None
+        finally:
+            if temporary is not None:
+                os.remove(temporary)
+        return name
+
+
+post_images = ContentAddressedStorage()
+
+
+def register(name):
+    from .models import StoredImage
+
+    StoredImage.objects.get_or_create(name=name)
+
+
+def acquire(name):
+    from .models import StoredImage
+
+    register(name)
+    StoredImage.objects.filter(name=name).update(refs=F('refs') + 1)
+
+
+def release(name):
+    """Отпускает ссылку; последняя удаляет файл и его миниатюры."""
+    from .models import StoredImage
+
+    with transaction.atomic():
+        StoredImage.objects.filter(name=name, refs__gt=0).update(
+            refs=F('refs') - 1)
+        deleted, _ = StoredImage.objects.filter(name=name, refs=0).delete()
+        if deleted:
+            delete_with_thumbnails(ImageFile(name, post_images))
+
+
+def recount():
+    """Сверяет счетчики ссылок с постами; возвращает {имя: (было, стало)}.
+
+    Строки без постов, в том числе файлы без единой ссылки, удаляются
+    вместе с файлами.
+    """
+    from .models import Post, StoredImage
+
+    actual = {
+        name: count
+        for name, count in Post.objects.exclude(image='').order_by().values(
+            'image').annotate(count=Count('pk')).values_list('image', 'count')
+        if is_addressed(name)
+    }
+    stored = dict(StoredImage.objects.values_list('name', 'refs'))
+    drift = {}
+    for name in set(actual) | set(stored):
+        old, new = stored.get(name), actual.get(name, 0)
+        if old == new and new:
+            continue
+        drift[name] = (old, new)
+        if new:
+            StoredImage.objects.update_or_create(
+                name=name, defaults={'refs': new})
+        else:
+            StoredImage.objects.filter(name=name).update(refs=1)
+            release(name)
+    return drift
@@ -0,0 +1,28 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from posts import cards
+
+register = template.Library()
+
+CARD_TEMPLATE = 'posts/includes/post_layout.html'
+SEPARATOR = '<hr>'
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts, group_flag=False):
+    """Карточки постов списка за один проход.
+
+    Готовые карточки берутся из кэша (posts.cards). Для остальных шаблон
+    карточки берется у движка один раз на список, а слой контекста
+    кладется один раз и только меняет post, тогда как {% include %} в
+    цикле ищет шаблон и создает контекст на каждый пост.
+    """
+    card = context.template.engine.get_template(CARD_TEMPLATE)
+    with context.push(group_flag=group_flag):
+        def render(post):
+            context['post'] = post
+            return card.render(context)
+
+        return mark_safe(SEPARATOR.join(
+            cards.render_many(posts, render, group_flag)))
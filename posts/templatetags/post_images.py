@@ -0,0 +1,36 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+def srcset(post, image_format):
+    return ', '.join(
+        f'{im.url} {width}w'
+        for (width, variant_format), im in post.thumbnails.items()
+        if variant_format == image_format and im is not None)
+
+
+@register.inclusion_tag('posts/includes/post_image.html')
+def post_image(post):
+    """Картинка поста со srcset или заглушка, пока миниатюр нет."""
+    if not post.image:
+        return {}
+    if not hasattr(post, 'thumbnails'):
+        thumbnails.attach([post])
+    if None in post.thumbnails.values():
+        thumbnails.schedule(post)
+    geometry, options = thumbnails.POST_IMAGE
+    return {
+        'im': post.thumbnail,
+        'geometry': geometry.split('x'),
+        'srcset': srcset(post, 'JPEG'),
+        'sources': [
+            {'type': thumbnails.MIME_TYPES[image_format],
+             'srcset': srcset(post, image_format)}
+            for image_format in thumbnails.SRCSET_FORMATS
+            if image_format != 'JPEG' and srcset(post, image_format)
+        ],
+        'sizes': thumbnails.SIZES,
+    }
@@ -0,0 +1,101 @@
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+from posts.paginators import EstimatedCountPaginator
+
+
+class AdminChangelistTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        self.client = Client()
+        self.client.force_login(self.admin)
+        self.authors = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(3)
+        ]
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        for author in self.authors:
+            post = Post.objects.create(
+                author=author, group=self.group, text='Про телефон')
+            Comment.objects.create(
+                post=post, author=author, text='Хороший чехол')
+            Follow.objects.create(user=self.admin, author=author)
+
+    def changelist(self, model, **params):
+        return self.client.get(
+            reverse(f'admin:posts_{model}_changelist'), params)
+
+    def test_queries_do_not_grow_with_rows(self):
+        """Число запросов списка не зависит от числа строк."""
+        for model in ('post', 'comment', 'follow'):
+            with self.subTest(model=model):
+                with CaptureQueriesContext(connection) as before:
+                    self.changelist(model)
+                author = User.objects.create_user(
+                    username=f'more_{model}')
+                post = Post.objects.create(
+                    author=author, group=self.group, text='Еще')
+                Comment.objects.create(post=post, author=author, text='Да')
+                Follow.objects.create(user=author, author=self.authors[0])
+                with CaptureQueriesContext(connection) as after:
+                    self.changelist(model)
+                self.assertEqual(len(after), len(before))
+
+    def test_group_is_autocomplete_widget(self):
+        """Группа в строке списка - autocomplete, а не полный select."""
+        response = self.changelist('post')
+        self.assertContains(response, 'admin-autocomplete')
+        self.assertContains(
+            response,
+            f'<option value="{self.group.pk}" selected>{self.group}</option>',
+            count=3)
+
+    def test_username_filter(self):
+        response = self.changelist(
+            'follow', author=self.authors[1].username)
+        self.assertEqual(
+            list(response.context['cl'].result_list),
+            list(Follow.objects.filter(author=self.authors[1])))
+        self.assertNotContains(response, '?user__id__exact=')
+
+    def test_search_by_username_and_comment_words(self):
+        response = self.changelist('comment', q=self.authors[2].username)
+        self.assertEqual(
+            [comment.author for comment in response.context['cl'].result_list],
+            [self.authors[2]])
+        Comment.objects.create(
+            post=Post.objects.first(), author=self.admin, text='Спасибо')
+        response = self.changelist('comment', q='чехол')
+        self.assertEqual(
+            [comment.text for comment in response.context['cl'].result_list],
+            ['Хороший чехол'] * 3)
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    def setUp(self):
+        author = User.objects.create_user(username='author')
+        Post.objects.bulk_create(
+            Post(author=author, text=str(number)) for number in range(30))
+
+    def test_small_table_counted_exactly(self):
+        paginator = EstimatedCountPaginator(Post.objects.all(), 10)
+        self.assertEqual(paginator.count, 30)
+
+    def test_large_table_estimated_without_count(self):
+        paginator = EstimatedCountPaginator(Post.objects.all(), 10)
+        paginator.count_limit = 5
+        with CaptureQueriesContext(connection) as queries:
+            self.assertGreaterEqual(paginator.count, 30)
+        self.assertFalse(any(
+            'COUNT(' in query['sql'] for query in queries))
+
+    def test_filtered_count_is_capped(self):
+        paginator = EstimatedCountPaginator(
+            Post.objects.filter(text__startswith='1'), 10)
+        paginator.count_limit = 5
+        self.assertEqual(paginator.count, 5)
@@ -0,0 +1,76 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Post, User
+from yatube.settings import COMMENTS_PER_PAGE as PER_PAGE
+
+
+class CommentPagesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.post = Post.objects.create(author=self.author, text='Телефон')
+        self.comments = [
+            Comment.objects.create(
+                post=self.post, author=self.reader, text=f'Комментарий {i}')
+            for i in range(PER_PAGE + 2)
+        ]
+        self.detail_url = reverse('posts:post_detail', args=(self.post.pk,))
+        self.comments_url = reverse(
+            'posts:post_comments', args=(self.post.pk,))
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_first_page_inline_and_rest_by_cursor(self):
+        """На странице поста - новые комментарии, остальные - по курсору."""
+        response = self.client.get(self.detail_url)
+        page = response.context['comments']
+        self.assertEqual(list(page), self.comments[::-1][:PER_PAGE])
+        self.assertContains(
+            response, f'{self.comments_url}?after={page.next_cursor}')
+        response = self.client.get(
+            self.comments_url, {'after': page.next_cursor})
+        self.assertEqual(
+            list(response.context['comments']), self.comments[1::-1])
+        self.assertNotContains(response, 'more-comments')
+        self.assertNotContains(response, '<html')
+
+    def test_json(self):
+        first = self.client.get(self.comments_url, {'format': 'json'}).json()
+        self.assertEqual(
+            [comment['id'] for comment in first['comments']],
+            [comment.pk for comment in self.comments[::-1][:PER_PAGE]])
+        self.assertEqual(first['comments'][0]['author'], 'reader')
+        rest = self.client.get(self.comments_url, {
+            'format': 'json', 'after': first['next']}).json()
+        self.assertEqual(len(rest['comments']), 2)
+        self.assertIsNone(rest['next'])
+
+    def test_first_page_cached_until_new_comment(self):
+        self.client.get(self.detail_url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.detail_url)
+        self.assertFalse(any(
+            'posts_comment' in query['sql'] and 'COUNT' not in query['sql']
+            for query in queries))
+        self.client.post(
+            reverse('posts:add_comment', args=(self.post.pk,)),
+            {'text': 'Свежий комментарий'})
+        self.assertContains(
+            self.client.get(self.detail_url), 'Свежий комментарий')
+
+    def test_renamed_commenter_is_shown(self):
+        """Новое имя автора комментариев видно во фрагменте и в кэше
+        страниц."""
+        guest, author = Client(), Client()
+        author.force_login(self.author)
+        author.get(self.detail_url)
+        guest.get(self.comments_url)
+        self.reader.username = 'renamed'
+        self.reader.save()
+        self.assertContains(author.get(self.detail_url), 'renamed')
+        self.assertContains(guest.get(self.comments_url), 'renamed')
@@ -0,0 +1,124 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.testing import QueryBudgetMixin
+from posts.models import Comment, Follow, Group, Post, User
+
+AUTHOR_NAME = 'pavel'
+READER_NAME = 'reader'
+SLUG = 'test-slug'
+MAIN_URL = reverse('posts:index')
+GROUP_URL = reverse('posts:group_list', args=(SLUG,))
+PROFILE_URL = reverse('posts:profile', args=(AUTHOR_NAME,))
+FOLLOW_INDEX_URL = reverse('posts:follow_index')
+
+
+class ConditionalGetTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username=AUTHOR_NAME)
+        self.reader = User.objects.create_user(username=READER_NAME)
+        self.group = Group.objects.create(
+            title='Тестовая группа', slug=SLUG, description='Описание')
+        self.post = Post.objects.create(
+            author=self.author, group=self.group, text='Тестовый пост')
+        self.post_url = reverse('posts:post_detail', args=(self.post.pk,))
+        self.guest = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def revalidate(self, client, url, response):
+        return client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_pages_answer_not_modified(self):
+        """Повтор с ETag получает 304 без рендеринга и чтения постов."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        for url in (MAIN_URL, GROUP_URL, PROFILE_URL, self.post_url,
+                    FOLLOW_INDEX_URL):
+            with self.subTest(url=url):
+                # Первый ответ с формой ставит CSRF-куку, а она входит в
+                # ETag вошедшего пользователя.
+                self.reader_client.get(url)
+                response = self.reader_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('Last-Modified', response)
+                with self.assertQueryBudget(3):
+                    again = self.revalidate(
+                        self.reader_client, url, response)
+                self.assertEqual(again.status_code, 304)
+                self.assertEqual(again.templates, [])
+
+    def test_if_modified_since(self):
+        response = self.reader_client.get(MAIN_URL)
+        again = self.reader_client.get(
+            MAIN_URL, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(again.status_code, 304)
+
+    def test_changes_invalidate_validators(self):
+        """Новый пост, комментарий и подписка меняют ETag страниц."""
+        changes = (
+            (MAIN_URL, lambda: Post.objects.create(
+                author=self.author, text='Новый пост')),
+            (self.post_url, lambda: Comment.objects.create(
+                post=self.post, author=self.reader, text='Комментарий')),
+            # На странице поста - число постов автора.
+            (self.post_url, lambda: Post.objects.create(
+                author=self.author, text='Еще пост')),
+            (PROFILE_URL, lambda: Follow.objects.create(
+                user=self.reader, author=self.author)),
+            (FOLLOW_INDEX_URL, lambda: Post.objects.create(
+                author=self.author, text='Пост для подписчика')),
+        )
+        for url, change in changes:
+            with self.subTest(url=url):
+                response = self.reader_client.get(url)
+                change()
+                self.assertEqual(self.revalidate(
+                    self.reader_client, url, response).status_code, 200)
+
+    def test_feed_validators_follow_changes(self):
+        """ETag ленты подписок без перечня подписок в поколениях."""
+        Follow.objects.create(user=self.reader, author=self.author)
+
+        def rename_group():
+            self.group.title = 'Переименованная'
+            self.group.save()
+
+        changes = (
+            lambda: Comment.objects.create(
+                post=self.post, author=self.reader, text='Комментарий'),
+            lambda: Post.objects.filter(pk=self.post.pk).first().delete(),
+            rename_group,
+        )
+        for change in changes:
+            with self.subTest(change=change):
+                response = self.reader_client.get(FOLLOW_INDEX_URL)
+                change()
+                self.assertEqual(self.revalidate(
+                    self.reader_client, FOLLOW_INDEX_URL,
+                    response).status_code, 200)
+        other = User.objects.create_user(username='other')
+        response = self.reader_client.get(FOLLOW_INDEX_URL)
+        Post.objects.create(author=other, text='Чужой пост')
+        self.assertEqual(self.revalidate(
+            self.reader_client, FOLLOW_INDEX_URL, response).status_code, 304)
+
+    def test_validators_are_per_user(self):
+        """ETag страницы читателя не подходит другому посетителю."""
+        response = self.reader_client.get(PROFILE_URL)
+        self.assertEqual(
+            self.revalidate(self.guest, PROFILE_URL, response).status_code,
+            200)
+        author_client = Client()
+        author_client.force_login(self.author)
+        self.assertEqual(
+            self.revalidate(author_client, PROFILE_URL, response).status_code,
+            200)
+
+    def test_page_cache_hit_answers_not_modified(self):
+        """Анонимный повтор получает 304 прямо из кэша страниц."""
+        response = self.guest.get(MAIN_URL)
+        again = self.revalidate(self.guest, MAIN_URL, response)
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again['X-Page-Cache'], 'hit')
@@ -0,0 +1,95 @@
+import csv
+import io
+import json
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import exports
+from posts.models import Comment, Group, Post, User
+
+AUTHOR_NAME = 'pavel'
+EXPORT_URL = reverse('posts:profile_export', args=(AUTHOR_NAME,))
+
+
+class ProfileExportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.author = User.objects.create_user(username=AUTHOR_NAME)
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        self.posts = [
+            Post.objects.create(
+                author=self.author, group=self.group if i % 2 else None,
+                text=f'Товар, "модель" {i}')
+            for i in range(5)
+        ]
+        Post.objects.filter(pk=self.posts[0].pk).update(image='posts/a.jpg')
+        Comment.objects.create(
+            post=self.posts[1], author=self.author, text='Комментарий')
+        Post.objects.create(
+            author=User.objects.create_user(username='other'), text='Чужой')
+
+    def get(self, client=None, **params):
+        response = (client or Client()).get(EXPORT_URL, params)
+        content = b''.join(response.streaming_content).decode()
+        response.close()
+        return response, content
+
+    def test_csv(self):
+        response, content = self.get(format='csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn(f'{AUTHOR_NAME}.csv', response['Content-Disposition'])
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(
+            [int(row['id']) for row in rows],
+            [post.pk for post in self.posts[::-1]])
+        self.assertEqual(rows[-1]['text'], 'Товар, "модель" 0')
+        self.assertEqual(
+            rows[-1]['image'], 'http://testserver/media/posts/a.jpg')
+        self.assertEqual(rows[-2]['group'], 'group')
+        self.assertEqual(rows[-2]['comments'], '1')
+
+    def test_jsonl(self):
+        response, content = self.get(format='jsonl')
+        records = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(len(records), 5)
+        self.assertEqual(records[-2]['comments'], 1)
+        self.assertIsNone(records[0]['group'] or None)
+
+    def test_unknown_format(self):
+        response = Client().get(EXPORT_URL, {'format': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_rows_are_read_in_chunks(self):
+        """Пачка за пачкой по курсору, а не весь каталог сразу."""
+        with CaptureQueriesContext(connection) as queries:
+            chunks = list(exports.lines(
+                self.author.pk, 'jsonl', lambda url: url, chunk_size=2))
+        self.assertEqual([chunk.count('\n') for chunk in chunks], [2, 2, 1])
+        self.assertEqual(len(queries), 3)
+        self.assertTrue(all('LIMIT 2' in query['sql'] for query in queries))
+
+    def test_throttling(self):
+        """Один посетитель не чаще раза в интервал, слотов ограниченно."""
+        client = Client()
+        self.assertEqual(self.get(client)[0].status_code, 200)
+        response = client.get(EXPORT_URL)
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        slots = [exports.acquire(f'client-{i}') for i in range(3)]
+        self.assertIsNone(slots[-1])
+        self.assertEqual(
+            Client(REMOTE_ADDR='10.0.0.1').get(EXPORT_URL).status_code, 429)
+        exports.release(slots[0])
+        self.assertEqual(
+            self.get(Client(REMOTE_ADDR='10.0.0.1'))[0].status_code, 200)
+
+    def test_closing_unread_response_releases_slot(self):
+        Client().get(EXPORT_URL).close()
+        self.assertIsNotNone(exports.acquire('next'))
+        self.assertIsNotNone(exports.acquire('another'))
@@ -0,0 +1,107 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, override_settings, TestCase
+from django.urls import reverse
+
+from posts.models import FeedEntry, Follow, Post, User
+
+AUTHOR_NAME = 'pavel'
+FOLLOWER_NAME = 'FAN'
+FOLLOW_POSTS_URL = reverse('posts:follow_index')
+FOLLOW_URL = reverse('posts:profile_follow', args=(AUTHOR_NAME,))
+UNFOLLOW_URL = reverse('posts:profile_unfollow', args=(AUTHOR_NAME,))
+
+
+class FollowFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=AUTHOR_NAME)
+        cls.follower = User.objects.create_user(username=FOLLOWER_NAME)
+        cls.old_post = Post.objects.create(
+            author=cls.author,
+            text='Пост до подписки',
+        )
+        cls.authorized_follower = Client()
+        cls.authorized_follower.force_login(cls.follower)
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def feed(self):
+        return list(self.authorized_follower.get(
+            FOLLOW_POSTS_URL).context['page_obj'])
+
+    def test_follow_backfills_feed(self):
+        """Подписка добавляет в ленту старые посты автора."""
+        self.authorized_follower.get(FOLLOW_URL)
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.follower, post=self.old_post).exists())
+        self.assertEqual(self.feed(), [self.old_post])
+
+    def test_new_post_fans_out(self):
+        """Новый пост раскладывается в ленты подписчиков."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        entry = FeedEntry.objects.get(user=self.follower, post=post)
+        self.assertEqual(entry.pub_date, post.pub_date)
+        self.assertEqual(self.feed(), [post, self.old_post])
+
+    def test_unfollow_prunes_feed(self):
+        """Отписка убирает посты автора из ленты."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.authorized_follower.get(UNFOLLOW_URL)
+        self.assertFalse(
+            FeedEntry.objects.filter(user=self.follower).exists())
+        self.assertEqual(self.feed(), [])
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_popular_author_is_pulled_on_read(self):
+        """Посты популярного автора читаются без раскладки."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertFalse(FeedEntry.objects.exists())
+        self.assertEqual(self.feed(), [post, self.old_post])
+
+    def test_feed_cursor_pages(self):
+        Follow.objects.create(user=self.follower, author=self.author)
+        Post.objects.bulk_create([
+            Post(author=self.author, text=str(i)) for i in range(10)
+        ])
+        call_command('rebuild_feeds', FOLLOWER_NAME, stdout=StringIO())
+        first_page = self.authorized_follower.get(
+            FOLLOW_POSTS_URL).context['page_obj']
+        second_page = self.authorized_follower.get(
+            FOLLOW_POSTS_URL, {'after': first_page.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(len(first_page), 10)
+        self.assertEqual(list(second_page), [self.old_post])
+
+    def test_rebuild_feeds_command(self):
+        Follow.objects.create(user=self.follower, author=self.author)
+        FeedEntry.objects.all().delete()
+        call_command('rebuild_feeds', stdout=StringIO())
+        self.assertEqual(self.feed(), [self.old_post])
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_rebuild_all_skips_pulled_authors(self):
+        Follow.objects.create(user=self.follower, author=self.author)
+        call_command('rebuild_feeds', stdout=StringIO())
+        self.assertFalse(FeedEntry.objects.exists())
+        self.assertEqual(self.feed(), [self.old_post])
+
+    @override_settings(FEED_FANOUT_LIMIT=1)
+    def test_author_below_limit_is_fanned_out_again(self):
+        """После отписки до порога посты режима pull остаются в ленте."""
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        Follow.objects.get(user=other).delete()
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.follower, post=post).exists())
+        self.assertEqual(self.feed(), [post, self.old_post])
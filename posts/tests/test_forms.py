@@ -1,3 +1,4 @@
+import hashlib
 import shutil
 import tempfile
 
@@ -25,6 +26,8 @@ SMALL_GIF = (
     b'\x02\x00\x01\x00\x00\x02\x02\x0C'
     b'\x0A\x00\x3B'
 )
+SMALL_GIF_DIGEST = hashlib.sha256(SMALL_GIF).hexdigest()
+SMALL_GIF_NAME = f'posts/{SMALL_GIF_DIGEST[:2]}/{SMALL_GIF_DIGEST}.gif'
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -133,7 +136,7 @@ class PostCreateFormTests(TestCase):
         self.assertEqual(post.text, form_data['text'])
         self.assertEqual(post.author, self.post.author)
         self.assertEqual(post.group.id, form_data['group'])
-        self.assertIn(form_data['image'].name, post.image.name)
+        self.assertEqual(post.image.name, SMALL_GIF_NAME)
         self.assertRedirects(response, self.POST_DETAIL_URL)
 
     def test_not_author_edit_post(self):
@@ -217,7 +220,7 @@ class PostCreateTests(TestCase):
         self.assertEqual(post.text, form_data['text'])
         self.assertEqual(post.author, self.user)
         self.assertEqual(post.group.id, form_data['group'])
-        self.assertIn(form_data['image'].name, post.image.name)
+        self.assertEqual(post.image.name, SMALL_GIF_NAME)
 
     def test_guest_creation_post(self):
         """Проверка, что гость не может создать пост"""
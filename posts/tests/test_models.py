@@ -1,6 +1,12 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.template.defaultfilters import truncatewords
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-from posts.models import Group, Post, User
+from posts.models import Comment, Group, Post, User
 
 
 class PostModelTest(TestCase):
@@ -25,3 +31,41 @@ class PostModelTest(TestCase):
         for value, expected in values:
             with self.subTest(value=value):
                 self.assertEqual(value, expected)
+
+
+class RenderedTextTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='auth')
+        self.post = Post.objects.create(
+            author=self.user, text='<b>Телефон</b>\nдва ' + 'слово ' * 40)
+
+    def test_save_renders_text(self):
+        self.assertTrue(self.post.text_html.startswith(
+            '&lt;b&gt;Телефон&lt;/b&gt;<br>два'))
+        self.assertEqual(
+            self.post.excerpt, truncatewords(self.post.text, 30))
+        comment = Comment.objects.create(
+            post=self.post, author=self.user, text='Раз\nдва')
+        self.assertEqual(comment.text_html, 'Раз<br>два')
+        self.assertEqual(comment.excerpt, 'Раз два')
+
+    def test_update_fields(self):
+        self.post.text = 'Чехол'
+        self.post.save(update_fields=['text'])
+        self.post.refresh_from_db()
+        self.assertEqual(
+            (self.post.text_html, self.post.excerpt), ('Чехол', 'Чехол'))
+
+    def test_rebuild_text(self):
+        Post.objects.update(text_html='', excerpt='')
+        call_command('rebuild_text', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertIn('<br>', self.post.text_html)
+        self.assertTrue(self.post.excerpt)
+
+    def test_feed_does_not_read_text(self):
+        with CaptureQueriesContext(connection) as queries:
+            post = Post.objects.for_feed().get()
+            post.text_html, post.excerpt
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"posts_post"."text",', queries[0]['sql'])
@@ -0,0 +1,116 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+AUTHOR_NAME = 'pavel'
+READER_NAME = 'reader'
+SLUG = 'test-slug'
+MAIN_URL = reverse('posts:index')
+GROUP_URL = reverse('posts:group_list', args=(SLUG,))
+PROFILE_URL = reverse('posts:profile', args=(AUTHOR_NAME,))
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=AUTHOR_NAME)
+        cls.reader = User.objects.create_user(username=READER_NAME)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug=SLUG,
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author,
+            group=cls.group,
+            text='Тестовый пост',
+        )
+        cls.POST_DETAIL_URL = reverse(
+            'posts:post_detail', args=(cls.post.id,))
+
+    def setUp(self):
+        cache.clear()
+        self.guest = Client()
+
+    def assertCached(self, url, state):
+        response = self.guest.get(url)
+        self.assertEqual(response.get('X-Page-Cache'), state)
+        return response
+
+    def test_guest_pages_are_cached(self):
+        """Анонимные страницы со второго раза отдаются из кэша."""
+        for url in (MAIN_URL, GROUP_URL, PROFILE_URL, self.POST_DETAIL_URL):
+            with self.subTest(url=url):
+                self.assertCached(url, 'miss')
+                self.assertCached(url, 'hit')
+                self.assertCached(f'{url}?page=1', 'miss')
+
+    def test_new_post_purges_its_pages(self):
+        """Новый пост сбрасывает главную, профиль, страницу группы и
+        страницы постов автора."""
+        for url in (MAIN_URL, GROUP_URL, PROFILE_URL, self.POST_DETAIL_URL):
+            self.guest.get(url)
+        Post.objects.create(
+            author=self.author, group=self.group, text='Свежий пост')
+        for url in (MAIN_URL, GROUP_URL, PROFILE_URL):
+            with self.subTest(url=url):
+                self.assertContains(
+                    self.assertCached(url, 'miss'), 'Свежий пост')
+        # На странице поста автора - число его постов.
+        self.assertContains(
+            self.assertCached(self.POST_DETAIL_URL, 'miss'),
+            '<span >2</span>')
+
+    def test_deleted_post_updates_author_post_pages(self):
+        other = Post.objects.create(author=self.author, text='Второй пост')
+        self.guest.get(self.POST_DETAIL_URL)
+        other.delete()
+        self.assertContains(
+            self.assertCached(self.POST_DETAIL_URL, 'miss'),
+            '<span >1</span>')
+
+    def test_comment_and_follow_purge_pages(self):
+        self.guest.get(self.POST_DETAIL_URL)
+        self.guest.get(PROFILE_URL)
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Новый коммент')
+        self.assertContains(
+            self.assertCached(self.POST_DETAIL_URL, 'miss'), 'Новый коммент')
+        self.guest.get(PROFILE_URL)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertContains(
+            self.assertCached(PROFILE_URL, 'miss'),
+            'Подписчиков производителя: 1')
+
+    def test_only_rename_purges_pages(self):
+        """Смена пароля не сбрасывает страницы, смена имени автора -
+        сбрасывает."""
+        author = User.objects.get(pk=self.author.pk)
+        self.guest.get(self.POST_DETAIL_URL)
+        author.set_password('new-password')
+        author.save()
+        self.assertCached(self.POST_DETAIL_URL, 'hit')
+        author.username = 'renamed'
+        author.save()
+        self.assertContains(
+            self.assertCached(self.POST_DETAIL_URL, 'miss'), 'renamed')
+
+    def test_session_bypasses_cache(self):
+        """Запросы с сессией не читают и не пишут кэш страниц."""
+        authorized = Client()
+        authorized.force_login(self.reader)
+        self.assertIn(settings.SESSION_COOKIE_NAME, authorized.cookies)
+        for i in range(2):
+            self.assertIsNone(authorized.get(MAIN_URL).get('X-Page-Cache'))
+        self.assertCached(MAIN_URL, 'miss')
+
+    def test_csrf_pages_are_not_cached(self):
+        """Страницы с CSRF-токеном не попадают в кэш."""
+        url = reverse('users:login')
+        with self.settings(PAGE_CACHE_VIEWS=('users:login',)):
+            for i in range(2):
+                self.assertIsNone(self.guest.get(url).get('X-Page-Cache'))
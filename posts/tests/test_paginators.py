@@ -0,0 +1,81 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+from posts.paginators import CachedCountPaginator
+
+MAIN_URL = reverse('posts:index')
+ELLIPSIS = CachedCountPaginator.ELLIPSIS
+
+
+def count_queries(queries):
+    return sum(
+        query['sql'].startswith('SELECT COUNT(') for query in queries)
+
+
+class CachedCountPaginatorTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.author = User.objects.create_user(username='author')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        Post.objects.bulk_create(
+            Post(author=self.author, group=self.group, text=str(number))
+            for number in range(25))
+
+    def paginator(self, queryset=None, **kwargs):
+        if queryset is None:
+            queryset = Post.objects.filter(group=self.group)
+        return CachedCountPaginator(queryset, 10, **kwargs)
+
+    def test_count_is_cached_per_version(self):
+        self.assertEqual(self.paginator(version='1').count, 25)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.paginator(version='1').count, 25)
+        self.assertEqual(len(queries), 0)
+        Post.objects.create(author=self.author, group=self.group, text='Еще')
+        self.assertEqual(self.paginator(version='2').count, 26)
+
+    def test_count_skips_feed_annotations(self):
+        """COUNT не вычисляет число комментариев каждого поста."""
+        with CaptureQueriesContext(connection) as queries:
+            count = self.paginator(
+                self.group.posts.for_feed().order_by('-pub_date')).count
+        self.assertEqual(count, 25)
+        self.assertNotIn('posts_comment', queries[-1]['sql'])
+
+    def test_known_count_skips_database(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.paginator(known_count=25).num_pages, 3)
+        self.assertEqual(len(queries), 0)
+
+    def test_overestimated_count_is_corrected(self):
+        """Страница за пределами оценки ведет на реальную последнюю."""
+        paginator = self.paginator(known_count=100)
+        page = paginator.get_page(8)
+        self.assertEqual(page.number, 3)
+        self.assertEqual(len(page), 5)
+        self.assertEqual(paginator.count, 25)
+
+    def test_elided_page_range(self):
+        paginator = self.paginator(known_count=1000)
+        self.assertEqual(list(paginator.get_elided_page_range(50)), [
+            1, 2, ELLIPSIS, 47, 48, 49, 50, 51, 52, 53, ELLIPSIS, 99, 100])
+        self.assertEqual(list(paginator.get_elided_page_range(1)), [
+            1, 2, 3, 4, ELLIPSIS, 99, 100])
+        self.assertEqual(
+            list(self.paginator().get_elided_page_range(2)), [1, 2, 3])
+
+    def test_index_pages_do_not_count_twice(self):
+        client = Client()
+        client.get(MAIN_URL, {'page': 1})
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(MAIN_URL, {'page': 2})
+        self.assertEqual(count_queries(queries), 0)
+        self.assertEqual(response.context['page_obj'].paginator.count, 25)
+        self.assertEqual(
+            response.context['page_obj'].paginator.exact_count, 25)
@@ -0,0 +1,117 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.template import Context, engines
+from django.template.loaders.cached import Loader as CachedLoader
+from django.test import Client, SimpleTestCase, TestCase
+from django.urls import reverse
+
+from posts import cards
+from posts.management.commands.bench_cards import VARIANTS, sample_posts
+from posts.models import Comment, Group, Post, User
+
+MAIN_URL = reverse('posts:index')
+
+
+def render(source, **context):
+    return engines['django'].engine.from_string(source).render(
+        Context(context))
+
+
+class PostCardsTests(SimpleTestCase):
+    def test_same_html_as_include_loop(self):
+        posts = sample_posts(4)
+        self.assertEqual(
+            render(VARIANTS['post_cards'], posts=posts),
+            render(VARIANTS['include'], posts=posts))
+
+    def test_group_flag_and_context(self):
+        """group_flag прячет ссылку на группу, контекст после тега прежний."""
+        posts = sample_posts(2)
+        html = render(
+            '{% load post_cards %}{% post_cards posts group_flag=True %}'
+            '{{ post|default:"none" }}', posts=posts)
+        self.assertNotIn('/group/', html)
+        self.assertEqual(html.count('<hr>'), 1)
+        self.assertTrue(html.endswith('none'))
+
+    def test_empty_list(self):
+        self.assertEqual(render(
+            '{% load post_cards %}{% post_cards posts as cards %}'
+            '{{ cards|default:"empty" }}', posts=[]), 'empty')
+
+    def test_templates_are_cached_without_debug(self):
+        self.assertIsInstance(
+            engines['django'].engine.template_loaders[0], CachedLoader)
+
+    def test_benchmark(self):
+        out, err = StringIO(), StringIO()
+        call_command(
+            'bench_cards', posts=3, repeat=2, stdout=out, stderr=err)
+        self.assertIn('cards warm', out.getvalue())
+        self.assertEqual(err.getvalue(), '')
+
+
+class CardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.author = User.objects.create_user(username='author')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        self.post = Post.objects.create(
+            author=self.author, group=self.group, text='Телефон')
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def render_many(self, posts):
+        rendered = []
+
+        def render(post):
+            rendered.append(post.pk)
+            return f'card {post.pk}'
+        return cards.render_many(posts, render), rendered
+
+    def test_only_misses_are_rendered(self):
+        other = Post.objects.create(author=self.author, text='Чехол')
+        posts = list(Post.objects.for_feed())
+        self.assertEqual(
+            self.render_many(posts),
+            ([f'card {other.pk}', f'card {self.post.pk}'],
+             [other.pk, self.post.pk]))
+        cache.delete(cards.key(posts[0]))
+        self.assertEqual(
+            self.render_many(Post.objects.for_feed())[1], [other.pk])
+
+    def test_pending_thumbnails_are_not_cached(self):
+        post = Post.objects.for_feed().get()
+        post.thumbnails = {(960, 'JPEG'): None}
+        self.render_many([post])
+        self.assertEqual(self.render_many([post])[1], [post.pk])
+
+    def test_changes_invalidate_cards(self):
+        """Правка поста, смена группы и новый комментарий видны в ленте."""
+        other_group = Group.objects.create(
+            title='Другая группа', slug='other', description='Описание')
+
+        def rename_group():
+            other_group.title = 'Переименованная'
+            other_group.save()
+
+        self.client.get(MAIN_URL)
+        changes = (
+            (lambda: self.client.post(
+                reverse('posts:post_edit', args=(self.post.pk,)),
+                {'text': 'Новый текст', 'group': other_group.pk}),
+             'Новый текст'),
+            (lambda: None, '#Другая группа'),
+            (rename_group, '#Переименованная'),
+            (lambda: Comment.objects.create(
+                post=self.post, author=self.author, text='Комментарий'),
+             'комментариев: 1'),
+        )
+        for change, text in changes:
+            with self.subTest(text=text):
+                change()
+                self.assertContains(self.client.get(MAIN_URL), text)
@@ -0,0 +1,119 @@
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.testing import QueryBudgetMixin
+from posts import search
+from posts.models import Comment, Follow, Group, Post, User
+from posts.paginators import encode_position
+from yatube.settings import POSTS_PER_PAGE
+
+AUTHOR_NAME = 'pavel'
+READER_NAME = 'reader'
+SLUG = 'test-slug'
+MAIN_URL = reverse('posts:index')
+GROUP_URL = reverse('posts:group_list', args=(SLUG,))
+PROFILE_URL = reverse('posts:profile', args=(AUTHOR_NAME,))
+FOLLOW_INDEX_URL = reverse('posts:follow_index')
+SEARCH_URL = reverse('posts:search')
+CREATE_POST_URL = reverse('posts:post_create')
+FOLLOW_URL = reverse('posts:profile_follow', args=(AUTHOR_NAME,))
+UNFOLLOW_URL = reverse('posts:profile_unfollow', args=(AUTHOR_NAME,))
+
+
+class QueryPlanTests(QueryBudgetMixin, TestCase):
+    """Запросы страниц читают индексы, а не таблицы целиком.
+
+    Каждая страница открывается в нескольких режимах (первая страница,
+    курсор, номер страницы), и для каждого ее SELECT проверяется план.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username=AUTHOR_NAME)
+        self.reader = User.objects.create_user(username=READER_NAME)
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug=SLUG,
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.posts = [
+            Post.objects.create(
+                author=self.author, group=self.group, text=f'Телефон {i}')
+            for i in range(POSTS_PER_PAGE + 1)
+        ]
+        self.post = self.posts[-1]
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Чехол')
+        self.client = Client()
+        self.client.force_login(self.reader)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def assertPagesIndexed(self, url, temp_sort=False):
+        """Первая, следующая по курсору и нумерованные страницы."""
+        with self.assertIndexedQueries(temp_sort=temp_sort):
+            response = self.client.get(url)
+        cursor = response.context['page_obj'].next_cursor
+        self.assertIsNotNone(cursor)
+        for page in (f'?after={cursor}', '?page=1', '?page=2'):
+            with self.subTest(page=page), self.assertIndexedQueries(
+                    temp_sort=temp_sort):
+                self.client.get(url + page)
+
+    def test_feeds(self):
+        for url in (MAIN_URL, GROUP_URL, PROFILE_URL, FOLLOW_INDEX_URL):
+            with self.subTest(url=url):
+                self.assertPagesIndexed(url)
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_follow_index_with_pulled_authors(self):
+        """Посты авторов без раскладки подмешиваются по индексу.
+
+        Строки приходят из двух диапазонов индексов (записи ленты и посты
+        авторов), поэтому их объединение сортируется; полного скана нет.
+        """
+        self.assertPagesIndexed(FOLLOW_INDEX_URL, temp_sort=True)
+
+    def test_post_detail(self):
+        with self.assertIndexedQueries():
+            self.client.get(
+                reverse('posts:post_detail', args=(self.post.pk,)))
+        url = reverse('posts:post_comments', args=(self.post.pk,))
+        for params in ({}, {'after': encode_position(
+                self.post.pub_date.isoformat(), 1)}):
+            with self.subTest(params=params), self.assertIndexedQueries():
+                self.client.get(url, params)
+
+    def test_profile_export(self):
+        url = reverse('posts:profile_export', args=(AUTHOR_NAME,))
+        with self.assertIndexedQueries():
+            response = self.client.get(url)
+            b''.join(response.streaming_content)
+            response.close()
+
+    def test_search(self):
+        """Сортировка по релевантности внутри FTS5 неизбежна, посты
+        по найденным id читаются по первичному ключу."""
+        with self.assertIndexedQueries(ignore=(f'FROM {search.TABLE}',)):
+            self.client.get(SEARCH_URL, {'q': 'телефон'})
+
+    def test_writes(self):
+        """Запросы вокруг записи: комментарий, пост, подписки."""
+        post_id = self.post.pk
+        requests = (
+            (self.client, 'post', reverse(
+                'posts:add_comment', args=(post_id,)), {'text': 'Текст'}),
+            (self.client, 'post', UNFOLLOW_URL, None),
+            (self.client, 'post', FOLLOW_URL, None),
+            (self.author_client, 'get', CREATE_POST_URL, None),
+            (self.author_client, 'post', CREATE_POST_URL, {'text': 'Новый'}),
+            (self.author_client, 'get', reverse(
+                'posts:post_edit', args=(post_id,)), None),
+        )
+        # Список производителей в форме поста - вся небольшая таблица.
+        groups = ('FROM "posts_group"',)
+        for client, method, url, data in requests:
+            with self.subTest(url=url), self.assertIndexedQueries(groups):
+                getattr(client, method)(url, data)
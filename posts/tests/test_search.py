@@ -0,0 +1,120 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import search
+from posts.models import Comment, Post, User
+from posts.stemmer import stem
+
+SEARCH_URL = reverse('posts:search')
+
+
+class StemmerTests(TestCase):
+    def test_word_forms_share_stem(self):
+        """Разные формы слова приводятся к одной основе."""
+        for forms in (
+            ('телефон', 'телефоны', 'телефонами', 'телефонов'),
+            ('красивый', 'красивая', 'красивые', 'красивого'),
+            ('ёлка', 'елки', 'ёлкой'),
+        ):
+            with self.subTest(forms=forms):
+                self.assertEqual(len({stem(word) for word in forms}), 1)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.phone = Post.objects.create(
+            author=self.author, text='Продаем красивые телефоны')
+        self.case = Post.objects.create(
+            author=self.author, text='Чехол из кожи')
+        Comment.objects.create(
+            post=self.case, author=self.author, text='Подходит к телефону')
+
+    def found(self, query):
+        return [pk for pk, score in search.ranked(query)]
+
+    def test_inflected_query_finds_post(self):
+        self.assertEqual(self.found('Красивый телефон')[:1], [self.phone.pk])
+
+    def test_text_match_ranks_above_comment_match(self):
+        """Совпадение в тексте поста выше совпадения в комментарии."""
+        self.assertEqual(self.found('телефонами'), [
+            self.phone.pk, self.case.pk])
+
+    def test_index_follows_edits_and_deletes(self):
+        self.phone.text = 'Продаем планшеты'
+        self.phone.save()
+        self.assertEqual(self.found('телефон'), [self.case.pk])
+        self.assertEqual(self.found('планшет'), [self.phone.pk])
+        self.case.comments.all().delete()
+        self.assertEqual(self.found('телефон'), [])
+        self.case.delete()
+        self.assertEqual(self.found('чехол'), [])
+
+    def test_comment_changes_update_only_their_terms(self):
+        """Комментарий меняет свой вклад, не перечитывая остальные."""
+        for i in range(3):
+            Comment.objects.create(
+                post=self.case, author=self.author, text=f'Кожа {i}')
+        with CaptureQueriesContext(connection) as queries:
+            comment = Comment.objects.create(
+                post=self.case, author=self.author, text='Планшеты')
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if 'FROM "posts_comment"' in query['sql']])
+        self.assertEqual(self.found('планшет'), [self.case.pk])
+        comment.text = 'Ноутбук'
+        comment.save()
+        self.assertEqual(self.found('планшет'), [])
+        self.assertEqual(self.found('ноутбук'), [self.case.pk])
+        comment.delete()
+        self.assertEqual(self.found('ноутбук'), [])
+        self.assertEqual(self.found('телефон кожа'), [self.case.pk])
+        search.rebuild()
+        self.assertEqual(self.found('телефон кожа'), [self.case.pk])
+
+    def test_query_syntax_is_not_interpreted(self):
+        """Кавычки и операторы FTS5 в запросе не ломают поиск."""
+        for query in ('"телефон', 'NOT OR', 'телефон*)', '!!!'):
+            with self.subTest(query=query):
+                search.ranked(query)
+
+    @override_settings(POSTS_PER_PAGE=2)
+    def test_search_view_pages_by_keyset(self):
+        for i in range(3):
+            Post.objects.create(author=self.author, text=f'Телефон {i}')
+        response = Client().get(SEARCH_URL, {'q': 'телефон'})
+        seen = [post.pk for post in response.context['page_obj']]
+        while response.context['page_obj'].has_next():
+            response = Client().get(SEARCH_URL, {
+                'q': 'телефон',
+                'after': response.context['page_obj'].next_cursor})
+            seen += [post.pk for post in response.context['page_obj']]
+        self.assertEqual(seen, self.found('телефон'))
+        self.assertEqual(len(seen), 5)
+
+    def test_rebuild_search_command(self):
+        search.rebuild()
+        call_command('rebuild_search', stdout=StringIO())
+        self.assertEqual(self.found('чехол кожа'), [self.case.pk])
+
+    def test_admin_search_uses_index(self):
+        admin = User.objects.create_superuser(
+            username='admin', email='a@a.ru', password='pass')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'телефоны'})
+        self.assertEqual(
+            {post.pk for post in response.context['cl'].result_list},
+            {self.phone.pk, self.case.pk})
+        response = client.get(
+            reverse('admin:posts_comment_changelist'), {'q': 'телефоны'})
+        self.assertEqual(
+            [comment.text for comment in response.context['cl'].result_list],
+            ['Подходит к телефону'])
@@ -0,0 +1,75 @@
+import json
+import os
+import shutil
+import tempfile
+from collections import Counter
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase, override_settings
+
+from posts import benchmark, seed
+from posts.models import Comment, FeedEntry, Follow, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class SeedTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        call_command(
+            'seed', users=40, groups=3, posts=300, comments=200, follows=5,
+            image_share=0.5, stdout=StringIO())
+
+    def test_dataset(self):
+        self.assertEqual(User.objects.count(), 40)
+        self.assertEqual(Post.objects.count(), 300)
+        self.assertEqual(Comment.objects.count(), 200)
+        self.assertTrue(Post.objects.exclude(image='').exists())
+        self.assertTrue(FeedEntry.objects.exists())
+        self.assertFalse(Follow.objects.filter(user=F('author')).exists())
+
+    def test_authors_follow_power_law(self):
+        """Самый популярный автор пишет намного больше медианного."""
+        counts = sorted(Counter(
+            Post.objects.values_list('author', flat=True)).values())
+        self.assertGreater(counts[-1], counts[len(counts) // 2] * 3)
+
+    def test_user_can_log_in(self):
+        self.assertTrue(self.client.login(
+            username=seed.username(0), password=seed.PASSWORD))
+
+    def test_benchmark_report(self):
+        output = os.path.join(TEMP_MEDIA_ROOT, 'report.json')
+        call_command(
+            'bench_routes', requests=3, warmup=1, writes=True,
+            output=output, stdout=StringIO())
+        with open(output, encoding='utf-8') as stream:
+            report = json.load(stream)
+        self.assertEqual(report['dataset']['post'], 300)
+        routes = {result['route'] for result in report['results']}
+        self.assertTrue({
+            'index', 'group_list', 'profile', 'post_detail', 'search',
+            'follow_index', 'add_comment', 'profile_export',
+        } <= routes)
+        for result in report['results']:
+            with self.subTest(
+                    route=result['route'], visitor=result['visitor']):
+                self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+                self.assertTrue(set(result['statuses']) <= {200, 302})
+                # Анонимные страницы отдаются из кэша страниц без запросов.
+                if result['visitor'] == 'user':
+                    self.assertGreater(result['queries'], 0)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(benchmark.percentile(values, 50), 50)
+        self.assertEqual(benchmark.percentile(values, 99), 99)
+        self.assertEqual(benchmark.percentile([7], 95), 7)
@@ -0,0 +1,84 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import stats
+from posts.models import AuthorStats, Comment, Follow, Post, User
+
+AUTHOR_NAME = 'pavel'
+FOLLOWER_NAME = 'FAN'
+FOLLOW_URL = reverse('posts:profile_follow', args=(AUTHOR_NAME,))
+UNFOLLOW_URL = reverse('posts:profile_unfollow', args=(AUTHOR_NAME,))
+
+
+class AuthorStatsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=AUTHOR_NAME)
+        cls.follower = User.objects.create_user(username=FOLLOWER_NAME)
+        cls.authorized_follower = Client()
+        cls.authorized_follower.force_login(cls.follower)
+
+    def stats(self, user):
+        return AuthorStats.objects.get(user=user)
+
+    def test_posts_and_comments_are_counted(self):
+        """Создание и удаление постов и комментариев меняют счетчики."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        Comment.objects.create(post=post, author=self.follower, text='К')
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.follower).comments_count, 1)
+        Post.objects.filter(pk=post.pk).delete()
+        self.assertEqual(self.stats(self.author).posts_count, 0)
+        self.assertEqual(self.stats(self.follower).comments_count, 0)
+
+    def test_delete_with_zero_counter(self):
+        """Удаление не падает, если счетчик уже разошелся до нуля."""
+        Post.objects.create(author=self.author, text='Пост')
+        AuthorStats.objects.filter(user=self.author).update(posts_count=0)
+        Post.objects.filter(author=self.author).delete()
+        self.assertEqual(self.stats(self.author).posts_count, 0)
+
+    def test_follow_and_unfollow_are_counted(self):
+        """Подписка и отписка меняют счетчики обеих сторон."""
+        self.authorized_follower.get(FOLLOW_URL)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.follower).following_count, 1)
+        self.authorized_follower.get(UNFOLLOW_URL)
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.follower).following_count, 0)
+
+    def test_recount_fixes_drift(self):
+        """Сверка находит и исправляет расхождения."""
+        Post.objects.create(author=self.author, text='Пост')
+        Follow.objects.create(user=self.follower, author=self.author)
+        AuthorStats.objects.filter(user=self.author).update(posts_count=7)
+        AuthorStats.objects.filter(user=self.follower).delete()
+        out = StringIO()
+        call_command('recount_stats', '--batch-size=1', stdout=out)
+        self.assertIn('posts_count 7 -> 1', out.getvalue())
+        self.assertIn('с расхождениями: 2', out.getvalue())
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.follower).following_count, 1)
+
+    def test_recount_dry_run_changes_nothing(self):
+        AuthorStats.objects.filter(user=self.author).update(posts_count=7)
+        call_command('recount_stats', '--dry-run', stdout=StringIO())
+        self.assertEqual(self.stats(self.author).posts_count, 7)
+
+    def test_recount_keeps_concurrent_bump(self):
+        """Пост, созданный во время сверки, не теряется при записи."""
+        Post.objects.create(author=self.author, text='Пост')
+        AuthorStats.objects.filter(user=self.author).update(posts_count=7)
+
+        def create_post(*args, **kwargs):
+            Post.objects.create(author=self.author, text='Еще пост')
+
+        with mock.patch.object(
+                AuthorStats.objects, 'bulk_create', side_effect=create_post):
+            stats.recount(User.objects.filter(pk=self.author.pk))
+        self.assertEqual(self.stats(self.author).posts_count, 2)
@@ -0,0 +1,111 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from posts import storage
+from posts.models import Post, StoredImage, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+OTHER_GIF = SMALL_GIF[:-1] + b'\x00\x3B'
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, content=SMALL_GIF, name='photo.gif'):
+        return Post.objects.create(
+            author=self.author,
+            text='Товар',
+            image=SimpleUploadedFile(name, content, content_type='image/gif'),
+        )
+
+    def refs(self, name):
+        return StoredImage.objects.filter(name=name).values_list(
+            'refs', flat=True).first()
+
+    def test_same_upload_is_stored_once(self):
+        """Одинаковые загрузки - один файл с двумя ссылками."""
+        first = self.create_post(name='first.gif')
+        second = self.create_post(name='second.gif')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(storage.is_addressed(first.image.name))
+        self.assertEqual(self.refs(first.image.name), 2)
+        directory = os.path.dirname(first.image.path)
+        self.assertEqual(os.listdir(directory), [
+            os.path.basename(first.image.name)])
+
+    def test_file_is_deleted_with_last_reference(self):
+        first = self.create_post()
+        second = self.create_post()
+        path = first.image.path
+        first.delete()
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(self.refs(second.image.name), 1)
+        second.delete()
+        self.assertFalse(os.path.exists(path))
+        self.assertIsNone(self.refs(second.image.name))
+
+    def test_replaced_image_is_released(self):
+        """Замена картинки при редактировании отпускает старую ссылку."""
+        post = self.create_post()
+        old_path = post.image.path
+        post.image = SimpleUploadedFile(
+            'new.gif', OTHER_GIF, content_type='image/gif')
+        post.save()
+        self.assertFalse(os.path.exists(old_path))
+        self.assertEqual(self.refs(post.image.name), 1)
+
+    def test_same_image_reuploaded(self):
+        """Повторная загрузка той же картинки не добавляет ссылку."""
+        post = self.create_post()
+        post.image = SimpleUploadedFile(
+            'again.gif', SMALL_GIF, content_type='image/gif')
+        post.save()
+        self.assertEqual(self.refs(post.image.name), 1)
+        path = post.image.path
+        post.delete()
+        self.assertFalse(os.path.exists(path))
+
+    def test_recount_collects_unreferenced_upload(self):
+        name = storage.post_images.save('posts/lost.gif', ContentFile(
+            OTHER_GIF))
+        self.assertEqual(self.refs(name), 0)
+        self.assertEqual(storage.recount(), {name: (0, 0)})
+        self.assertFalse(storage.post_images.exists(name))
+
+    def test_dedupe_images_converts_legacy_files(self):
+        legacy = FileSystemStorage().save(
+            'posts/legacy.gif', ContentFile(SMALL_GIF))
+        posts = [self.create_post() for _ in range(2)]
+        Post.objects.filter(pk__in=[post.pk for post in posts]).update(
+            image=legacy)
+        call_command('dedupe_images', stdout=StringIO())
+        names = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(names, {posts[0].image.name})
+        self.assertEqual(self.refs(posts[0].image.name), 2)
+        self.assertFalse(FileSystemStorage().exists(legacy))
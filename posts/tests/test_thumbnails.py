@@ -0,0 +1,151 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.queries import QueryRecorder
+from posts import generations, thumbnails
+from posts.models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+INDEX_URL = reverse('posts:index')
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.author = User.objects.create_user(username='author')
+        self.post = self.create_post()
+        self.name = self.post.image.name
+
+    def create_post(self):
+        return Post.objects.create(
+            author=self.author,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(
+                'thumb.gif', SMALL_GIF, content_type='image/gif'),
+        )
+
+    def test_placeholder_until_thumbnail_is_ready(self):
+        """Пока миниатюры нет, в ленте заглушка, а не генерация в запросе."""
+        response = Client().get(INDEX_URL)
+        self.assertContains(response, 'aspect-ratio: 960 / 339')
+        self.assertNotContains(response, '<img class="card-img')
+        self.assertEqual(
+            len(thumbnails.missing(self.name)), len(thumbnails.VARIANTS))
+
+    def test_generated_thumbnail_is_shown(self):
+        self.assertEqual(
+            thumbnails.generate(self.name), len(thumbnails.VARIANTS))
+        self.assertEqual(thumbnails.generate(self.name), 0)
+        geometry, options = thumbnails.POST_IMAGE
+        im = thumbnails.backend.ready(self.name, geometry, **options)
+        cache.clear()
+        response = Client().get(INDEX_URL)
+        self.assertContains(response, im.url)
+
+    def test_warm_thumbnails_command(self):
+        out = StringIO()
+        call_command('warm_thumbnails', workers=1, stdout=out)
+        self.assertIn(
+            f'создано миниатюр: {len(thumbnails.VARIANTS)}', out.getvalue())
+        self.assertEqual(thumbnails.missing(self.name), [])
+
+    def test_page_resolves_thumbnails_in_one_lookup(self):
+        """Миниатюры страницы читаются одним запросом, а не по одной."""
+        posts = [self.post] + [self.create_post() for _ in range(4)]
+        for post in posts:
+            thumbnails.generate(post.image.name)
+        cache.clear()
+        with QueryRecorder() as recorder:
+            response = Client().get(INDEX_URL)
+        kvstore_queries = [
+            query for query in recorder.queries
+            if 'thumbnail_kvstore' in query['sql']]
+        self.assertEqual(len(kvstore_queries), 1)
+        for post in response.context['page_obj']:
+            self.assertIsNotNone(post.thumbnail)
+            self.assertContains(response, post.thumbnail.url)
+
+    def test_srcset_lists_width_variants(self):
+        """В srcset все ширины, WebP отдается отдельным source."""
+        thumbnails.generate(self.name)
+        cache.clear()
+        response = Client().get(INDEX_URL)
+        post = response.context['page_obj'][0]
+        for (width, image_format), im in post.thumbnails.items():
+            self.assertContains(response, f'{im.url} {width}w')
+        if 'WEBP' in thumbnails.SRCSET_FORMATS:
+            self.assertContains(response, 'type="image/webp"')
+            self.assertTrue(post.thumbnails[(320, 'WEBP')].url.endswith(
+                '.webp'))
+        self.assertEqual(post.thumbnails[(320, 'JPEG')].width, 320)
+
+    def test_shared_image_invalidates_every_waiting_post(self):
+        """Одна задача на общую картинку сбрасывает кэш всех ее постов."""
+        other = self.create_post()
+        self.assertEqual(other.image.name, self.name)
+        jobs = []
+
+        class Collecting:
+            def submit(self, *args):
+                jobs.append(args)
+
+        self.addCleanup(setattr, thumbnails, '_executor', thumbnails._executor)
+        thumbnails._executor = Collecting()
+        scopes = [
+            generations.scope('post', post.pk) for post in (self.post, other)]
+        before = generations.versions(*scopes).split('.')
+        for _, callback in connection.run_on_commit:
+            if callback.__qualname__ == 'schedule.<locals>.submit':
+                callback()
+        self.assertEqual(len(jobs), 1)
+        task, *args = jobs[0]
+        task(*args)
+        after = generations.versions(*scopes).split('.')
+        self.assertTrue(all(old != new for old, new in zip(before, after)))
+        self.assertEqual(thumbnails._pending, {})
+
+    def test_broken_image_is_not_rescheduled(self):
+        """Битую картинку не ставят в пул на каждом рендеринге."""
+        post = Post.objects.create(
+            author=self.author, text='Битая картинка',
+            image=SimpleUploadedFile(
+                'broken.gif', b'not an image', content_type='image/gif'))
+
+        def submits():
+            return [
+                callback for _, callback in connection.run_on_commit
+                if callback.__qualname__ == 'schedule.<locals>.submit']
+
+        self.addCleanup(thumbnails._pending.clear)
+        with self.assertLogs('posts.thumbnails', 'ERROR'):
+            thumbnails._task(post.image.name)
+        scheduled = len(submits())
+        thumbnails.schedule(post)
+        self.assertEqual(len(submits()), scheduled)
+        cache.delete(thumbnails.failed_key(post.image.name))
+        thumbnails.schedule(post)
+        self.assertEqual(len(submits()), scheduled + 1)
@@ -0,0 +1,148 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts import search, transfer
+from posts.models import Comment, Follow, Group, Post, User
+
+
+def snapshot():
+    return {
+        'users': sorted(User.objects.values_list('username', 'email')),
+        'groups': sorted(Group.objects.values_list('slug', 'title')),
+        'posts': sorted(Post.objects.values_list(
+            'pk', 'author__username', 'group__slug', 'text', 'pub_date')),
+        'comments': sorted(Comment.objects.values_list(
+            'pk', 'post', 'author__username', 'text', 'created')),
+        'follows': sorted(Follow.objects.values_list(
+            'user__username', 'author__username')),
+    }
+
+
+class TransferTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        author = User.objects.create_user(
+            username='author', email='author@example.com')
+        reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание, "с" ;')
+        posts = [
+            Post.objects.create(author=author, group=group, text='Телефон'),
+            Post.objects.create(author=author, text='Строка\nвторая'),
+        ]
+        Comment.objects.create(post=posts[0], author=reader, text='Чехол')
+        Follow.objects.create(user=reader, author=author)
+
+    def export(self, file_format):
+        call_command(
+            'export_content', self.directory, format=file_format,
+            chunk_size=1, stdout=StringIO())
+
+    def import_(self, file_format, **options):
+        call_command(
+            'import_content', self.directory, format=file_format,
+            chunk_size=1, stdout=StringIO(), **options)
+
+    def test_round_trip(self):
+        """Выгрузка и загрузка в пустую базу сохраняют все данные."""
+        for file_format in transfer.FORMATS:
+            with self.subTest(file_format=file_format):
+                before = snapshot()
+                self.export(file_format)
+                User.objects.all().delete()
+                Group.objects.all().delete()
+                self.import_(file_format)
+                self.assertEqual(snapshot(), before)
+
+    def test_import_rebuilds_derived_data(self):
+        self.export('jsonl')
+        User.objects.all().delete()
+        self.import_('jsonl')
+        self.assertEqual(len(search.ranked('телефон')), 1)
+        author = User.objects.get(username='author')
+        self.assertEqual(author.stats.posts_count, 2)
+
+    def test_repeated_import_is_idempotent(self):
+        before = snapshot()
+        self.export('csv')
+        self.import_('csv', no_rebuild=True)
+        self.assertEqual(snapshot(), before)
+
+    def assertResumes(self, file_format, lines):
+        """Загрузка с контрольной точки после первых lines строк файла
+        вставляет только второй пост."""
+        self.export(file_format)
+        Post.objects.all().delete()
+        source = transfer.path(
+            self.directory, transfer.table('posts'), file_format)
+        with open(source, 'rb') as stream:
+            offset = sum(len(stream.readline()) for _ in range(lines))
+        with open(transfer.checkpoint_path(source), 'w') as marker:
+            marker.write(f'1 {offset}')
+        done, skipped = transfer.load(
+            transfer.table('posts'), source, file_format, chunk_size=1)
+        self.assertEqual((done, skipped), (2, 0))
+        self.assertEqual(
+            list(Post.objects.values_list('text', flat=True)),
+            ['Строка\nвторая'])
+        self.assertFalse(os.path.exists(transfer.checkpoint_path(source)))
+
+    def test_import_resumes_from_checkpoint(self):
+        self.assertResumes('jsonl', 1)
+
+    def test_csv_import_resumes_before_multiline_row(self):
+        self.assertResumes('csv', 2)
+
+    def test_checkpoint_without_offset_restarts(self):
+        self.export('jsonl')
+        Post.objects.all().delete()
+        source = transfer.path(
+            self.directory, transfer.table('posts'), 'jsonl')
+        with open(transfer.checkpoint_path(source), 'w') as marker:
+            marker.write('1')
+        self.assertEqual(transfer.load(
+            transfer.table('posts'), source, 'jsonl'), (2, 0))
+        self.assertEqual(Post.objects.count(), 2)
+
+    def test_rows_without_date_are_skipped(self):
+        self.export('jsonl')
+        Post.objects.all().delete()
+        source = transfer.path(
+            self.directory, transfer.table('posts'), 'jsonl')
+        with open(source, encoding='utf-8') as stream:
+            rows = [json.loads(line) for line in stream]
+        rows[0]['pub_date'] = None
+        rows[1]['pub_date'] = 'не дата'
+        rows.append({**rows[1], 'id': 3, 'pub_date': '2024-02-30T00:00'})
+        with open(source, 'w', encoding='utf-8') as stream:
+            stream.writelines(json.dumps(row) + '\n' for row in rows)
+        self.assertEqual(transfer.load(
+            transfer.table('posts'), source, 'jsonl'), (3, 3))
+        self.assertFalse(Post.objects.exists())
+
+    def test_unknown_references_are_skipped(self):
+        self.export('jsonl')
+        User.objects.filter(username='reader').delete()
+        Comment.objects.all().delete()
+        source = transfer.path(
+            self.directory, transfer.table('comments'), 'jsonl')
+        self.assertEqual(transfer.load(
+            transfer.table('comments'), source, 'jsonl'), (1, 1))
+
+    def test_comments_of_unknown_posts_are_skipped(self):
+        self.export('jsonl')
+        Comment.objects.all().delete()
+        Post.objects.all().delete()
+        source = transfer.path(
+            self.directory, transfer.table('comments'), 'jsonl')
+        self.assertEqual(transfer.load(
+            transfer.table('comments'), source, 'jsonl'), (1, 1))
+        self.assertFalse(Comment.objects.exists())
@@ -7,7 +7,9 @@ from django.core.cache import cache
 from django.test import Client, override_settings, TestCase
 from django.urls import reverse
 
-from posts.models import Follow, Group, Post, User
+from core.testing import QueryBudgetMixin
+from posts import generations
+from posts.models import Comment, Follow, Group, Post, User
 from yatube.settings import POSTS_PER_PAGE
 
 SLUG_GROUP = 'test-slug'
@@ -113,6 +115,17 @@ class PostPagesTests(TestCase):
         user = response.context.get('author')
         self.assertEqual(user, self.author)
 
+    def test_author_stats_in_context(self):
+        """Счетчики в шапках считаются для автора, а не для зрителя."""
+        post = self.authorized_follower.get(
+            self.POST_DETAIL_URL).context['post']
+        self.assertEqual(post.author_posts_count, 1)
+        author = self.authorized_follower.get(
+            PROFILE_URL).context['author']
+        self.assertEqual(author.posts_count, 1)
+        self.assertEqual(author.followers_count, 1)
+        self.assertEqual(author.following_count, 0)
+
     def test_group_in_group_list_context(self):
         response = self.authorized_client.get(GROUP_URL)
         group = response.context.get('group')
@@ -186,6 +199,28 @@ class PaginatorTests(TestCase):
                 self.assertEqual(len(
                     self.authorized.get(address).context['page_obj']), number)
 
+    def test_cursor_pages(self):
+        """Курсоры ведут на соседние страницы без повторов."""
+        first_page = self.authorized.get(MAIN_URL).context['page_obj']
+        self.assertTrue(first_page.is_cursor)
+        self.assertFalse(first_page.has_previous())
+        second_page = self.authorized.get(
+            MAIN_URL, {'after': first_page.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(len(second_page), REMAINING_POSTS)
+        self.assertFalse(second_page.has_next())
+        self.assertFalse(set(first_page) & set(second_page))
+        previous_page = self.authorized.get(
+            MAIN_URL, {'before': second_page.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(previous_page), list(first_page))
+
+    def test_broken_cursor_opens_first_page(self):
+        first_page = self.authorized.get(MAIN_URL).context['page_obj']
+        page = self.authorized.get(
+            MAIN_URL, {'after': 'broken'}).context['page_obj']
+        self.assertEqual(list(page), list(first_page))
+
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class CacheTests(TestCase):
@@ -193,20 +228,136 @@ class CacheTests(TestCase):
     def setUpClass(cls):
         super().setUpClass()
         cls.author = User.objects.create_user(username=AUTHOR_NAME)
+        cls.follower = User.objects.create_user(username=FOLLOWER_NAME)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug=SLUG_GROUP,
+            description='Тестовое описание',
+        )
         cls.post = Post.objects.create(
             author=cls.author,
             text='Тестовый пост',
         )
         cls.authorized_client = Client()
         cls.authorized_client.force_login(cls.author)
+        cls.authorized_follower = Client()
+        cls.authorized_follower.force_login(cls.follower)
+
+    def setUp(self):
+        cache.clear()
 
     def test_cache_in_index(self):
         """Проверка работы кэша на главной странице"""
-        non_cleared_cache = self.authorized_client.get(MAIN_URL).content
+        cached = self.authorized_client.get(MAIN_URL).content
+        Post.objects.filter(pk=self.post.pk).update(text='В обход сигналов')
+        self.assertEqual(
+            cached, self.authorized_client.get(MAIN_URL).content)
         self.post.delete()
-        post_before_clearing_cache = self.authorized_client.get(
-            MAIN_URL).content
-        self.assertEqual(non_cleared_cache, post_before_clearing_cache)
+        invalidated = self.authorized_client.get(MAIN_URL).content
+        self.assertNotEqual(cached, invalidated)
+        self.assertNotIn('В обход сигналов', invalidated.decode())
+
+    def test_new_post_invalidates_pages(self):
+        """Новый пост сразу виден на всех страницах, где он показан."""
+        urls = (MAIN_URL, PROFILE_URL, GROUP_URL)
+        for url in urls:
+            self.authorized_client.get(url)
+        Post.objects.create(
+            author=self.author, group=self.group, text='Свежий пост')
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(
+                    self.authorized_client.get(url), 'Свежий пост')
+
+    def test_follow_page_has_own_fragment(self):
+        """Лента подписок не отдает фрагмент главной страницы."""
+        self.authorized_follower.get(MAIN_URL)
+        self.assertNotContains(
+            self.authorized_follower.get(FOLLOW_POSTS_URL), 'Тестовый пост')
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.assertContains(
+            self.authorized_follower.get(FOLLOW_POSTS_URL), 'Тестовый пост')
+
+    def test_fragments_differ_by_author_and_group(self):
+        """Равные поколения разных авторов и групп не делят фрагмент."""
+        other = User.objects.create_user(username='other')
+        other_group = Group.objects.create(
+            title='Другая группа', slug=SLUG_ANOTHER_GROUP,
+            description='Описание')
+        Post.objects.create(
+            author=other, group=other_group, text='Пост другого автора')
+        cache.set_many({
+            f'gen:{name}': 7 for name in (
+                generations.scope('author', self.author.pk),
+                generations.scope('author', other.pk),
+                generations.scope('group', self.group.pk),
+                generations.scope('group', other_group.pk),
+            )})
+        for url, other_url in ((PROFILE_URL, reverse(
+                'posts:profile', args=('other',))),
+                (GROUP_URL, ANOTHER_GROUP_URL)):
+            with self.subTest(url=url):
+                self.authorized_follower.get(other_url)
+                self.assertNotContains(
+                    self.authorized_follower.get(url),
+                    'Пост другого автора')
+
+    def test_group_change_invalidates_old_group(self):
+        self.post.group = self.group
+        self.post.save()
+        self.assertContains(
+            self.authorized_client.get(GROUP_URL), 'Тестовый пост')
+        self.post.group = None
+        self.post.save()
+        self.assertNotContains(
+            self.authorized_client.get(GROUP_URL), 'Тестовый пост')
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=AUTHOR_NAME)
+        cls.follower = User.objects.create_user(username=FOLLOWER_NAME)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug=SLUG_GROUP,
+            description='Тестовое описание',
+        )
+        Follow.objects.create(author=cls.author, user=cls.follower)
+        for i in range(NUMBER_OF_TEST_POSTS):
+            cls.post = Post.objects.create(
+                author=cls.author,
+                group=cls.group,
+                text=f'Тестовый пост {i}',
+            )
+        Comment.objects.bulk_create([
+            Comment(post=cls.post, author=cls.follower, text='Коммент')
+            for i in range(3)
+        ])
+        cls.authorized_follower = Client()
+        cls.authorized_follower.force_login(cls.follower)
+
+    def setUp(self):
         cache.clear()
-        cleared_cache = self.authorized_client.get(MAIN_URL).content
-        self.assertNotEqual(non_cleared_cache, cleared_cache)
+
+    def test_pages_fit_query_budget(self):
+        """Страницы укладываются в бюджет SQL-запросов."""
+        budgets = (
+            (MAIN_URL, 3),
+            (GROUP_URL, 4),
+            (PROFILE_URL, 5),
+            (reverse('posts:post_detail', args=(self.post.id,)), 4),
+            (FOLLOW_POSTS_URL, 5),
+        )
+        for url, budget in budgets:
+            with self.subTest(url=url):
+                cache.clear()
+                with self.assertQueryBudget(budget, max_repeats=1):
+                    self.authorized_follower.get(url)
+
+    def test_cached_page_skips_post_queries(self):
+        """Страница из кэша фрагментов не читает посты."""
+        self.authorized_follower.get(MAIN_URL)
+        with self.assertQueryBudget(2):
+            self.authorized_follower.get(MAIN_URL)
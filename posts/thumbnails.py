@@ -0,0 +1,262 @@
+"""Фоновая генерация миниатюр картинок постов.
+
+Для каждой картинки создается набор вариантов разной ширины (и WebP,
+если Pillow его поддерживает) для srcset; все они режутся из одного
+декодированного оригинала. Пока основной миниатюры нет, шаблон
+показывает заглушку и ставит генерацию в пул потоков, поэтому запрос не
+тратит время на декодирование и ресайз. Когда миниатюры готовы,
+сбрасываются кэши страниц поста, и следующий читатель получает картинку.
+Картинку, которую не удалось обработать (битый или удаленный оригинал),
+снова ставят в пул не раньше чем через THUMBNAIL_RETRY_DELAY секунд.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from PIL import features
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from . import generations, page_cache
+from .storage import post_images
+
+logger = logging.getLogger(__name__)
+
+# Основная миниатюра в ленте и на странице поста (src и запасной вариант).
+POST_IMAGE = ('960x339', {'crop': 'center', 'upscale': True})
+# Ширины для srcset; пропорции как у основной миниатюры.
+SRCSET_WIDTHS = (320, 640, 960)
+SRCSET_FORMATS = ('WEBP', 'JPEG') if features.check('webp') else ('JPEG',)
+MIME_TYPES = {'WEBP': 'image/webp', 'JPEG': 'image/jpeg'}
+SIZES = '(min-width: 1200px) 960px, 100vw'
+
+_executor = None
+# {картинка: {id поста: (id автора, автор, группа, области)}} для задач
+# в пуле.
+_pending = {}
+_lock = threading.Lock()
+
+
+def variant(width, image_format):
+    geometry, options = POST_IMAGE
+    full_width, full_height = map(int, geometry.split('x'))
+    options = dict(options)
+    if image_format != 'JPEG':
+        options['format'] = image_format
+    return f'{width}x{round(width * full_height / full_width)}', options
+
+
+VARIANTS = {
+    (width, image_format): variant(width, image_format)
+    for image_format in SRCSET_FORMATS
+    for width in SRCSET_WIDTHS
+}
+MAIN_VARIANT = (960, 'JPEG')
+
+
+class ReadyThumbnailBackend(ThumbnailBackend):
+    @staticmethod
+    def source_file(file_):
+        """Исходник; имена файлов относятся к хранилищу картинок постов."""
+        if isinstance(file_, str):
+            return ImageFile(file_, post_images)
+        return ImageFile(file_)
+
+    def thumbnail_options(self, source, options):
+        """Опции, дополненные так же, как это делает get_thumbnail."""
+        options = dict(options)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        return options
+
+    def thumbnail_file(self, file_, geometry_string, **options):
+        """Файл миниатюры с теми же опциями, что и у get_thumbnail."""
+        source = self.source_file(file_)
+        return ImageFile(
+            self._get_thumbnail_filename(
+                source, geometry_string,
+                self.thumbnail_options(source, options)),
+            default.storage)
+
+    def ready(self, file_, geometry_string, **options):
+        """Уже созданная миниатюра или None; ничего не генерирует."""
+        return default.kvstore.get(
+            self.thumbnail_file(file_, geometry_string, **options))
+
+    def ready_many(self, wanted):
+        """Готовые миниатюры для {ключ: (файл, геометрия, опции)}.
+
+        Возвращает {ключ: миниатюра или None}. Для cached_db-хранилища это
+        один get_many к кэшу и один запрос к таблице kvstore на промахи
+        вместо обращения на каждую миниатюру.
+        """
+        kvstore = default.kvstore
+        if not isinstance(kvstore, cached_db_kvstore.KVStore):
+            return {
+                key: self.ready(name, geometry, **options)
+                for key, (name, geometry, options) in wanted.items()}
+        keys = {
+            key: add_prefix(self.thumbnail_file(
+                name, geometry, **options).key)
+            for key, (name, geometry, options) in wanted.items()
+        }
+        values = kvstore.cache.get_many(set(keys.values()))
+        missed = set(keys.values()) - set(values)
+        if missed:
+            stored = dict(KVStoreModel.objects.filter(
+                key__in=missed).values_list('key', 'value'))
+            # Как и sorl, запоминаем отсутствие, чтобы не ходить в базу.
+            fetched = {
+                key: stored.get(key, cached_db_kvstore.EMPTY_VALUE)
+                for key in missed}
+            kvstore.cache.set_many(
+                fetched, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+            values.update(fetched)
+        return {
+            key: None if values[raw] == cached_db_kvstore.EMPTY_VALUE
+            else deserialize_image_file(values[raw])
+            for key, raw in keys.items()
+        }
+
+    def create_many(self, file_, variants):
+        """Создает миниатюры, декодируя оригинал один раз."""
+        source = self.source_file(file_)
+        source_image = default.engine.get_image(source)
+        try:
+            source.set_size(default.engine.get_image_size(source_image))
+            image_info = default.engine.get_image_info(source_image)
+            for geometry, options in variants:
+                options = self.thumbnail_options(source, options)
+                thumbnail = ImageFile(
+                    self._get_thumbnail_filename(source, geometry, options),
+                    default.storage)
+                # Как и get_thumbnail, не перезаписываем существующий файл:
+                # хранилище дало бы ему другое имя.
+                if (sorl_settings.THUMBNAIL_FORCE_OVERWRITE
+                        or not thumbnail.exists()):
+                    options['image_info'] = image_info
+                    self._create_thumbnail(
+                        source_image, geometry, options, thumbnail)
+                default.kvstore.get_or_set(source)
+                default.kvstore.set(thumbnail, source)
+        finally:
+            default.engine.cleanup(source_image)
+
+
+backend = ReadyThumbnailBackend()
+
+
+def attach(posts):
+    """Кладет в post.thumbnails готовые варианты картинки, всем разом.
+
+    post.thumbnails - {(ширина, формат): миниатюра или None}, а
+    post.thumbnail - основная миниатюра.
+    """
+    names = {post.image.name for post in posts if post.image}
+    found = backend.ready_many({
+        (name, key): (name, geometry, options)
+        for name in names
+        for key, (geometry, options) in VARIANTS.items()
+    })
+    for post in posts:
+        name = post.image.name
+        post.thumbnails = {
+            key: found[(name, key)] for key in VARIANTS} if name else {}
+        post.thumbnail = post.thumbnails.get(MAIN_VARIANT)
+
+
+def missing(name):
+    found = backend.ready_many({
+        key: (name, geometry, options)
+        for key, (geometry, options) in VARIANTS.items()
+    })
+    return [VARIANTS[key] for key, im in found.items() if im is None]
+
+
+def generate(name):
+    """Создает недостающие миниатюры; возвращает, сколько создано."""
+    todo = missing(name)
+    if todo:
+        backend.create_many(name, todo)
+    return len(todo)
+
+
+def executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'THUMBNAIL_WORKERS', 2),
+                thread_name_prefix='thumbnails')
+        return _executor
+
+
+def failed_key(name):
+    return f'thumbnail-failed:{name}'
+
+
+def _task(name):
+    # posts.models импортирует этот модуль, а feeds - модели.
+    from . import feeds
+
+    try:
+        created = generate(name)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', name)
+        cache.set(
+            failed_key(name), 1,
+            getattr(settings, 'THUMBNAIL_RETRY_DELAY', 60 * 10))
+        created = 0
+    with _lock:
+        posts = _pending.pop(name, {})
+    try:
+        if created:
+            # Картинка общая: заглушку показывали все посты, ждавшие ее.
+            generations.bump(*(
+                scope for *_, scopes in posts.values() for scope in scopes))
+            feeds.touch(*{author_id for author_id, *_ in posts.values()})
+            for post_id, (_, username, group_slug, _) in posts.items():
+                page_cache.purge_post(post_id, username, [group_slug])
+    finally:
+        connections.close_all()
+
+
+def schedule(post):
+    """Ставит генерацию миниатюр поста в пул после коммита транзакции.
+
+    Одна картинка генерируется одной задачей, а посты, которые ее ждут,
+    запоминаются, чтобы после генерации сбросить кэш каждого из них.
+    """
+    name = post.image.name
+    if not name or cache.get(failed_key(name)):
+        return
+    waiting = (
+        post.author_id,
+        post.author.username,
+        post.group.slug if post.group_id else None,
+        generations.post_scopes(post.author_id, post.group_id, post.pk),
+    )
+
+    def submit():
+        with _lock:
+            queued = name in _pending
+            _pending.setdefault(name, {})[post.pk] = waiting
+        if not queued:
+            executor().submit(_task, name)
+
+    transaction.on_commit(submit)
@@ -1,50 +1,169 @@
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.http import (
+    HttpResponse, HttpResponseBadRequest, JsonResponse,
+    StreamingHttpResponse)
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.http import urlencode
 
+from . import exports, generations, page_cache
+from .conditional import (
+    conditional_view, follow_scopes, index_scopes, post_detail_scopes,
+    profile_scopes, pull_authors)
+from .feeds import follow_feed
 from .forms import PostForm, CommentForm
-from .models import Group, Post, User, Follow
-
-from yatube.settings import POSTS_PER_PAGE
-
-
-def pagination(request, objects):
-    return Paginator(objects, POSTS_PER_PAGE).get_page(
-        request.GET.get('page'))
-
-
+from .models import Comment, Follow, Group, Post, User, authors_with_stats
+from .paginators import (
+    CachedCountPaginator, CursorPaginator, SearchPaginator)
+
+from yatube.settings import (
+    COMMENTS_PER_PAGE, EXPORT_INTERVAL, FRAGMENT_CACHE_TIMEOUT,
+    POSTS_PER_PAGE)
+
+
+def pagination(request, objects, field='pub_date', tiebreak='pk',
+               version='', count=None):
+    """Страница по курсору, а для ?page= - по номеру.
+
+    version - поколение области для кэша числа постов, count - уже
+    известное точное число постов.
+    """
+    if 'page' in request.GET:
+        # Тот же порядок, что у курсора: OFFSET идет по индексу ленты.
+        return CachedCountPaginator(
+            objects.order_by(f'-{field}', f'-{tiebreak}'), POSTS_PER_PAGE,
+            version=version, known_count=count,
+            timeout=FRAGMENT_CACHE_TIMEOUT,
+        ).get_page(request.GET.get('page'))
+    return CursorPaginator(
+        objects, POSTS_PER_PAGE, field, tiebreak
+    ).get_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'))
+
+
+def fragment_context(*scopes):
+    """Ключ и время жизни кэша фрагмента со списком постов."""
+    return {
+        'fragment_version': generations.versions(*scopes),
+        'fragment_timeout': FRAGMENT_CACHE_TIMEOUT,
+    }
+
+
+@conditional_view(index_scopes)
 def index(request):
+    fragment = fragment_context(generations.GLOBAL)
     return render(request, 'posts/index.html', {
-        'page_obj': pagination(request, Post.objects.all()),
+        'page_obj': pagination(
+            request, Post.objects.for_feed(),
+            version=fragment['fragment_version']),
+        **fragment,
     })
 
 
+@conditional_view()
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
+    fragment = fragment_context(generations.scope('group', group.pk))
     return render(request, 'posts/group_list.html', {
         'group': group,
-        'page_obj': pagination(request, group.posts.all()),
+        'page_obj': pagination(
+            request, group.posts.for_feed(),
+            version=fragment['fragment_version']),
+        **fragment,
     })
 
 
+@conditional_view(profile_scopes)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(authors_with_stats(), username=username)
     return render(request, 'posts/profile.html', {
-        'page_obj': pagination(request, author.posts.all()),
+        'page_obj': pagination(
+            request, author.posts.for_feed(), count=author.posts_count),
         'author': author,
         'following': (request.user.is_authenticated
                       and request.user.username != username
                       and Follow.objects.filter(
                           user=request.user,
                           author=author).exists()),
+        **fragment_context(generations.scope('author', author.pk)),
+    })
+
+
+def profile_export(request, username):
+    """Все посты производителя потоком в CSV или JSONL (?format=)."""
+    author = get_object_or_404(User, username=username)
+    file_format = request.GET.get('format', 'csv')
+    if file_format not in exports.CONTENT_TYPES:
+        return HttpResponseBadRequest('Формат: csv или jsonl.')
+    slot = exports.acquire(
+        request.user.pk if request.user.is_authenticated
+        else request.META.get('REMOTE_ADDR'))
+    if slot is None:
+        response = HttpResponse(
+            'Слишком много выгрузок, попробуйте позже.', status=429)
+        response['Retry-After'] = EXPORT_INTERVAL
+        return response
+    response = StreamingHttpResponse(
+        exports.Stream(
+            exports.lines(author.pk, file_format, request.build_absolute_uri),
+            slot),
+        content_type=exports.CONTENT_TYPES[file_format])
+    response['Content-Disposition'] = (
+        f'attachment; filename="{author.username}.{file_format}"')
+    return response
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    return render(request, 'posts/search.html', {
+        'query': query,
+        'page_obj': SearchPaginator(query, POSTS_PER_PAGE).get_page(
+            after=request.GET.get('after'),
+            before=request.GET.get('before')) if query else None,
+        'page_query': urlencode({'q': query}),
     })
 
 
+def comments_page(post_id, after=None):
+    """Страница комментариев поста по курсору, от новых к старым."""
+    return CursorPaginator(
+        Comment.objects.filter(post=post_id).select_related('author'),
+        COMMENTS_PER_PAGE, 'created',
+    ).get_page(after=after)
+
+
+@conditional_view(post_detail_scopes)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.for_feed().with_author_stats(), pk=post_id)
+    page_cache.remember_post_author(post.pk, post.author_id)
     return render(request, 'posts/post_detail.html', {
         'post': post,
         'form': CommentForm(),
+        'comments': comments_page(post.pk),
+        **fragment_context(generations.scope('comments', post.pk)),
+    })
+
+
+def post_comments(request, post_id):
+    """Следующая страница комментариев: HTML-фрагмент или ?format=json."""
+    comments = comments_page(post_id, request.GET.get('after'))
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [
+                {
+                    'id': comment.pk,
+                    'author': comment.author.username,
+                    'text': comment.text,
+                    'created': comment.created.isoformat(),
+                }
+                for comment in comments
+            ],
+            'next': comments.next_cursor,
+        })
+    return render(request, 'posts/includes/comment_list.html', {
+        'comments': comments,
+        'post_id': post_id,
     })
 
 
@@ -86,10 +205,15 @@ def post_edit(request, post_id):
 
 
 @login_required
+@conditional_view(follow_scopes)
 def follow_index(request):
+    fragment = fragment_context(*follow_scopes(request))
     return render(request, 'posts/follow.html', {
-        'page_obj': pagination(request, Post.objects.filter(
-            author__following__user=request.user)),
+        'page_obj': pagination(
+            request,
+            follow_feed(request.user, pull_authors(request)).for_feed(),
+            'feed_date', 'feed_post', version=fragment['fragment_version']),
+        **fragment,
     })
 
 
@@ -49,6 +49,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.QueryInspectorMiddleware',
+    'core.middleware.ReadReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -56,10 +58,14 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'posts.page_cache.AnonymousPageCacheMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
 
+# Загрузчики не заданы явно, поэтому без DEBUG Django оборачивает их в
+# django.template.loaders.cached.Loader: шаблоны компилируются один раз
+# на процесс. С DEBUG шаблоны перечитываются с диска.
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -82,12 +88,45 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+SQLITE_PRAGMAS = {
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+# Запись идет в default; чтение - через отдельное соединение только для
+# чтения к тому же файлу (core.db.routers). Соединения живут между
+# запросами.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+        'CONN_MAX_AGE': 600,
+        'OPTIONS': {
+            'timeout': 20,
+            'pragmas': {
+                **SQLITE_PRAGMAS,
+                'journal_mode': 'WAL',
+                'synchronous': 'NORMAL',
+            },
+        },
+    },
+    'replica': {
+        'ENGINE': 'core.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 600,
+        'OPTIONS': {
+            'timeout': 20,
+            'read_only': True,
+            'pragmas': {**SQLITE_PRAGMAS, 'query_only': 'ON'},
+        },
+        'TEST': {'MIRROR': 'default'},
+    },
 }
+DATABASE_ROUTERS = ['core.db.routers.ReadReplicaRouter']
+READ_REPLICA = 'replica'
+# Сколько секунд после записи пользователь читает из основной базы.
+READ_REPLICA_STICKY_SECONDS = 10
 
 
 # Password validation
@@ -142,14 +181,63 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 POSTS_PER_PAGE = 10
+# Комментарии поста: первая страница - в самой странице, следующие
+# подгружаются отдельными запросами.
+COMMENTS_PER_PAGE = 20
+
+# Выгрузка каталога производителя (posts.exports): постов в одной пачке,
+# одновременных выгрузок на весь сайт, секунд между выгрузками одного
+# посетителя и сколько живет слот выгрузки, если воркер его не вернул.
+EXPORT_CHUNK_SIZE = 500
+EXPORT_CONCURRENCY = 2
+EXPORT_INTERVAL = 60
+EXPORT_SLOT_TIMEOUT = 60 * 10
+
+# Авторы с большим числом подписчиков не раскладываются в ленты при
+# публикации, их посты подмешиваются в ленту при чтении.
+FEED_FANOUT_LIMIT = 1000
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Фрагменты со списками постов инвалидируются поколениями кэша
+# (posts.generations), поэтому могут жить долго.
+FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 6
+# HTML карточек постов (posts.cards): ключ меняется вместе с постом.
+POST_CARD_TIMEOUT = 60 * 60 * 24
+
+# Страницы, которые анонимные читатели получают из кэша целиком.
+# Их сбрасывают сигналы при изменении контента.
+PAGE_CACHE_VIEWS = (
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:post_comments',
+)
+PAGE_CACHE_TIMEOUT = 60 * 60
+
+# Сколько одинаковых запросов за один HTTP-запрос считать признаком N+1
+QUERY_REPEAT_THRESHOLD = 3
+
+# Потоки фоновой генерации миниатюр в каждом процессе
+THUMBNAIL_WORKERS = 2
+# Через сколько секунд снова пробовать картинку, которую не удалось
+# обработать.
+THUMBNAIL_RETRY_DELAY = 60 * 10
+
+# Общий для всех воркеров кэш в файле SQLite (см. core.sqlite_cache).
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.sqlite_cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 50000,
+            'CULL_FREQUENCY': 10,
+        },
     }
 }
+
+TEST_RUNNER = 'core.testing.TestRunner'